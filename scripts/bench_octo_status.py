@@ -0,0 +1,92 @@
+"""
+Micro-benchmark of OctoPrinter.current_status against a local fake OctoPrint server.
+
+Compares the wall-clock time per poll of fetching /api/printer and /api/job
+one after another with the concurrent path used by OctoPrinter.current_status.
+
+    poetry run python scripts/bench_octo_status.py --latency 0.05 --polls 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from printer import OctoPrinter
+
+EXAMPLES = Path(__file__).parent.parent / "examples" / "octo-rest-api"
+
+
+def fake_octoprint(latency: float) -> FastAPI:
+    app = FastAPI()
+    printer_state = json.loads((EXAMPLES / "resp_state_ready.json").read_text())
+    job_state = json.loads((EXAMPLES / "resp_get_job.json").read_text())
+
+    @app.get("/api/printer")
+    async def get_printer() -> JSONResponse:
+        await asyncio.sleep(latency)
+        return JSONResponse(printer_state)
+
+    @app.get("/api/job")
+    async def get_job() -> JSONResponse:
+        await asyncio.sleep(latency)
+        return JSONResponse(job_state)
+
+    return app
+
+
+async def sequential_status(printer: OctoPrinter) -> None:
+    await printer.printer_state()
+    await printer.latest_job()
+
+
+async def concurrent_status(printer: OctoPrinter) -> None:
+    await printer.current_status()
+
+
+async def measure(poll, printer: OctoPrinter, polls: int) -> float:
+    await poll(printer)  # warm up the connection pool
+
+    start = time.perf_counter()
+    for _ in range(polls):
+        await poll(printer)
+    return (time.perf_counter() - start) / polls
+
+
+async def main(latency: float, polls: int, port: int) -> None:
+    config = uvicorn.Config(
+        fake_octoprint(latency), port=port, log_level="warning", access_log=False
+    )
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    printer = OctoPrinter(url=f"http://127.0.0.1:{port}", api_key="bench")
+
+    sequential = await measure(sequential_status, printer, polls)
+    concurrent = await measure(concurrent_status, printer, polls)
+
+    print(f"simulated latency per request: {latency * 1000:.1f} ms")
+    print(f"sequential: {sequential * 1000:.1f} ms/poll")
+    print(f"concurrent: {concurrent * 1000:.1f} ms/poll")
+    print(f"speedup:    {sequential / concurrent:.2f}x")
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--port", type=int, default=5123)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.latency, args.polls, args.port))
@@ -0,0 +1,106 @@
+"""
+Benchmark of committing OPC UA updates of many printers.
+
+Uses MockOpcuaClient with a simulated round trip per commit, and compares
+each worker committing its own updates with the batch commit mode,
+where a single flusher commits the updates of all workers every tick.
+
+    poetry run python scripts/bench_opcua_commit.py --printers 100 --ticks 5 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import time
+
+from opcuax import OpcuaClient
+
+from service.opcua import MockOpcuaClient, OpcuaService
+from setting import app_settings
+
+
+class SlowMockOpcuaClient(MockOpcuaClient):
+    def __init__(self, latency: float) -> None:
+        super().__init__(endpoint="opc.tcp://mock-server:4840", namespace="bench")
+        self.latency: float = latency
+        self.commits: int = 0
+
+    async def commit(self) -> None:
+        self.commits += 1
+        await asyncio.sleep(self.latency)
+        await super().commit()
+
+
+class OpcuaPrinter:
+    """
+    An OPC UA object that queues a node write on every field update.
+    """
+
+    def __init__(self, client: SlowMockOpcuaClient) -> None:
+        object.__setattr__(self, "client", client)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        self.client.update_tasks.put_nowait((name, value))
+
+
+def create_service(
+    latency: float, batch: bool
+) -> tuple[OpcuaService, SlowMockOpcuaClient]:
+    client = SlowMockOpcuaClient(latency)
+
+    class SlowOpcuaService(OpcuaService):
+        @staticmethod
+        def create_opcua_client() -> OpcuaClient:
+            return client
+
+    return SlowOpcuaService(batch_commit=batch), client
+
+
+async def run(printers: int, ticks: int, latency: float, batch: bool) -> None:
+    # the flusher is started by connect() with this interval
+    app_settings.opcua_commit_interval = latency * 2
+    service, client = create_service(latency, batch)
+    await service.connect()
+
+    flusher = service.flusher
+    objects = [OpcuaPrinter(client) for _ in range(printers)]
+
+    async def tick(obj: OpcuaPrinter, tick: int) -> None:
+        service.update(obj, {"state": "printing", "progress": tick})
+        await service.commit()
+
+    start = time.perf_counter()
+    for i in range(ticks):
+        await asyncio.gather(*(tick(obj, i) for obj in objects))
+
+        # wait for the flusher to commit the updates of this tick
+        while service.queue_depth > 0:
+            await asyncio.sleep(latency / 10)
+    await service.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'batch' if batch else 'per worker'} commit:")
+    print(f"  commits: {client.commits}, total {elapsed:.2f}s")
+
+    expected = ticks if batch else ticks * printers
+    assert client.commits == expected, f"expected {expected} commits"
+
+    if flusher is not None:
+        print(
+            f"  max queue depth: {flusher.max_queue_depth},"
+            f" max flush latency: {flusher.max_flush_latency * 1000:.1f} ms"
+        )
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"{args.printers} printers, {args.ticks} ticks, {args.latency}s per commit")
+    await run(args.printers, args.ticks, args.latency, batch=False)
+    await run(args.printers, args.ticks, args.latency, batch=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--printers", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+
+    asyncio.run(main(parser.parse_args()))
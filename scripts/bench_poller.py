@@ -0,0 +1,124 @@
+"""
+Benchmark of event loop lag when polling many mock printers.
+
+Compares one PeriodicTask (asyncio task) per printer with a single
+PollScheduler dispatching the steps of all printers.
+
+    poetry run python scripts/bench_poller.py --printers 1000 --interval 1 --duration 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from typing_extensions import override
+
+from printer import MockPrinter
+from printer.models import PrinterStatus
+from task import PeriodicTask, PollScheduler
+
+PROBE_INTERVAL = 0.01
+
+
+class MockPoll(PeriodicTask):
+    def __init__(self, printer: MockPrinter, interval: float, phase: float) -> None:
+        super().__init__(interval, phase_secs=phase, jitter_secs=interval / 10)
+        self.printer: MockPrinter = printer
+        self.status: PrinterStatus | None = None
+
+    @override
+    async def step(self) -> None:
+        stat = await self.printer.current_status()
+        # a round trip of the status like the printer worker does
+        self.status = PrinterStatus.model_validate_json(stat.model_dump_json())
+
+
+async def probe_lag(duration: float) -> list[float]:
+    loop = asyncio.get_running_loop()
+    lags = []
+    end = loop.time() + duration
+
+    while loop.time() < end:
+        start = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(loop.time() - start - PROBE_INTERVAL)
+
+    return lags
+
+
+async def create_polls(printers: int, interval: float) -> list[MockPoll]:
+    polls = []
+
+    for i in range(printers):
+        printer = MockPrinter(url=f"http://mock.printer{i}")
+        await printer.connect()
+        # spread the first steps evenly over one interval
+        polls.append(MockPoll(printer, interval, phase=interval * i / printers))
+
+    return polls
+
+
+async def run_tasks(polls: list[MockPoll], duration: float) -> None:
+    for poll in polls:
+        poll.start()
+
+    lags = await probe_lag(duration)
+
+    for poll in polls:
+        poll.stop()
+
+    report("one task per printer", polls, lags)
+
+
+async def run_poller(polls: list[MockPoll], duration: float, concurrency: int) -> None:
+    poller = PollScheduler(max_concurrency=concurrency)
+    poller.start()
+
+    for poll in polls:
+        await poller.add(poll)
+
+    lags = await probe_lag(duration)
+    poller.stop()
+
+    report(f"poll scheduler (concurrency={concurrency})", polls, lags)
+
+
+def report(name: str, polls: list[MockPoll], lags: list[float]) -> None:
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1]
+    steps = sum(poll.ticks for poll in polls)
+    missed = sum(poll.missed_ticks for poll in polls)
+    lateness = statistics.mean(poll.max_tick_lateness for poll in polls) * 1000
+
+    print(f"{name}:")
+    print(f"  steps: {steps}, missed ticks: {missed}")
+    print(
+        f"  loop lag mean={statistics.mean(lags_ms):.2f} ms"
+        f" p99={p99:.2f} ms max={lags_ms[-1]:.2f} ms"
+    )
+    print(f"  mean of max tick lateness: {lateness:.2f} ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(f"{args.printers} printers, interval {args.interval}s, {args.duration}s run")
+
+    start = time.perf_counter()
+    await run_tasks(await create_polls(args.printers, args.interval), args.duration)
+    await asyncio.sleep(args.interval * 2)
+    await run_poller(
+        await create_polls(args.printers, args.interval),
+        args.duration,
+        args.concurrency,
+    )
+    print(f"total {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--printers", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=1)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark of building LatestPrinterStatus on every poll.
+
+Compares re-validating a dumped status with adding the printer fields
+of PrinterWorker.latest_status, which are validated once per worker.
+
+    poetry run python scripts/bench_status_build.py --printers 1000 --polls 20
+"""
+
+import argparse
+import time
+
+from pydantic import HttpUrl
+
+from db.models import Printer
+from printer import MockPrinter, PrinterApi
+from printer.models import LatestJob, PrinterState, PrinterStatus, Temperature
+from worker import LatestPrinterStatus, PrinterWorker
+
+
+def sample_status() -> PrinterStatus:
+    return PrinterStatus(
+        state=PrinterState.Printing,
+        temp_bed=Temperature(actual=59.8, target=60),
+        temp_nozzle=Temperature(actual=214.6, target=215),
+        job=LatestJob(
+            id=3,
+            file_path="/usb/model.bgcode",
+            previewed_model_url="http://localhost/thumbnail.png",
+            progress=42.5,
+            time_used=1200,
+            time_left=1600,
+        ),
+    )
+
+
+def validated_status(
+    printer: Printer, stat: PrinterStatus
+) -> tuple[LatestPrinterStatus, HttpUrl]:
+    latest = LatestPrinterStatus(
+        **stat.model_dump(),
+        name=printer.opcua_name or "",
+        model=printer.model or str(printer.api),
+        url=HttpUrl(printer.url),
+        camera_url=printer.camera_url,
+    )
+    # camera url of the OPC UA printer object
+    return latest, HttpUrl(latest.camera_url or "http://unknown")
+
+
+def measure(build, workers: list[PrinterWorker], polls: int) -> float:
+    stat = sample_status()
+
+    start = time.perf_counter()
+    for _ in range(polls):
+        for worker in workers:
+            build(worker, stat)
+    return time.perf_counter() - start
+
+
+def main(printers: int, polls: int) -> None:
+    workers = [
+        PrinterWorker(
+            printer=Printer(
+                id=i,
+                url=f"http://mock.printer{i}:5000",
+                api_key="key",
+                api=PrinterApi.Mock,
+                opcua_name=f"Printer{i}",
+                camera_url=f"http://mock.camera{i}:8080",
+                model="Mock Printer",
+            ),
+            api=MockPrinter(url=f"http://mock.printer{i}:5000"),
+        )
+        for i in range(printers)
+    ]
+
+    validated = measure(
+        lambda worker, stat: validated_status(worker.printer, stat), workers, polls
+    )
+    constructed = measure(
+        lambda worker, stat: worker.latest_status(stat), workers, polls
+    )
+    builds = printers * polls
+
+    print(f"{printers} printers, {polls} polls each")
+    print(
+        f"validated:   {validated / builds * 1e6:.1f} us/poll, {validated:.3f}s total"
+    )
+    print(
+        f"constructed: {constructed / builds * 1e6:.1f} us/poll, {constructed:.3f}s total"
+    )
+    print(f"speedup:     {validated / constructed:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--printers", type=int, default=1000)
+    parser.add_argument("--polls", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.printers, args.polls)
@@ -0,0 +1,8 @@
+-- Add the is_active column and indexes of hot job queries to an existing database,
+-- new databases get them from create_tables().
+-- is_active must be kept in sync with JOB_IS_ACTIVE_SQL in src/db/models.py.
+ALTER TABLE public.job
+    ADD COLUMN is_active boolean NOT NULL GENERATED ALWAYS AS (status > 4 AND (status & 256) = 0) STORED;
+
+CREATE INDEX ix_job_printer_id_is_active ON public.job (printer_id, is_active);
+CREATE INDEX ix_job_status_printer_id ON public.job (status, printer_id);
@@ -0,0 +1,36 @@
+import secrets
+from http import HTTPStatus
+
+from fastapi import Request, Response
+
+# versions restart from 0 when the server restarts, so ETags of different runs must not match
+_run_id: str = secrets.token_hex(4)
+
+
+def make_etag(*versions: int | str) -> str:
+    """
+    Make a weak ETag from versions of a resource.
+    :param versions: names and version counters identifying a representation of the resource
+    :return: ETag header value
+    """
+    return f'W/"{_run_id}-{"-".join(str(v) for v in versions)}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Check whether the ETag matches the If-None-Match header of the request.
+    :param request: HTTP request
+    :param etag: current ETag of the resource
+    :return: True if the client already has the current representation
+    """
+    header = request.headers.get("if-none-match")
+
+    if header is None:
+        return False
+
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
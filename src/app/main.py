@@ -5,8 +5,8 @@ from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from db import database
-from service import PrinterService, opcua_service
-from worker.manager import start_new_printer_worker
+from service import PrinterService, close_job_writer, opcua_service
+from worker.manager import start_new_printer_worker, stop_all_printer_workers
 from .routers import jobs, printers
 
 
@@ -21,6 +21,10 @@ async def lifespan(_: FastAPI) -> AsyncGenerator[None, None]:
 
     yield
 
+    # workers may still update jobs through the job writer
+    await stop_all_printer_workers()
+    await close_job_writer()
+    await opcua_service.close()
     await database.close()
 
 
@@ -1,13 +1,18 @@
-from collections.abc import Sequence
+import asyncio
+from collections.abc import AsyncIterator, Sequence
 from http import HTTPStatus
 from pathlib import Path
 from typing import Annotated
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.exc import NoResultFound
 
 from db.models import Job, JobStatus, JobHistory
-from service import JobService
+from service import CameraHub, JobService, Timelapse
+from service.camera import multipart_frame
+from service.thumbnail import preview_media_type, preview_path
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
@@ -26,6 +31,87 @@ async def get_job(job_id: int) -> JobDetails:
         return JobDetails(job=job, history=history)
 
 
+@router.get("/{job_id}/preview")
+async def get_job_preview(job_id: int) -> FileResponse:
+    async with JobService() as service:
+        try:
+            job = await service.get_job(job_id=job_id)
+        except NoResultFound:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="job not found"
+            )
+
+    path = None if job.gcode_file_path is None else preview_path(job.gcode_file_path)
+
+    if path is None:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="no preview available"
+        )
+
+    # previews are saved once with the gcode file
+    return FileResponse(
+        path,
+        media_type=preview_media_type(path),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+class TimelapseInfo(BaseModel):
+    frames: int
+
+
+def get_timelapse(job_id: int) -> Timelapse:
+    timelapse = Timelapse(job_id)
+
+    if not timelapse.exists():
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND, detail="timelapse not found"
+        )
+
+    return timelapse
+
+
+@router.get("/{job_id}/timelapse")
+async def get_timelapse_info(job_id: int) -> TimelapseInfo:
+    return TimelapseInfo(frames=get_timelapse(job_id).frame_count())
+
+
+@router.get("/{job_id}/timelapse/stream")
+async def play_timelapse(
+    job_id: int,
+    start: Annotated[int, Query(ge=0)] = 0,
+    fps: Annotated[float, Query(gt=0)] = 10,
+) -> StreamingResponse:
+    timelapse = get_timelapse(job_id)
+
+    async def play() -> AsyncIterator[bytes]:
+        async for frame in timelapse.frames(start):
+            yield multipart_frame(frame)
+            await asyncio.sleep(1 / fps)
+
+    return StreamingResponse(content=play(), media_type=CameraHub.media_type)
+
+
+@router.get("/{job_id}/timelapse/{n}")
+async def get_timelapse_frame(job_id: int, n: int) -> Response:
+    try:
+        frame = await get_timelapse(job_id).frame(n)
+    except IndexError:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="frame not found")
+
+    # recorded frames never change
+    return Response(
+        content=frame,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+async def upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(1024 * 1024):
+        yield chunk
+
+
 @router.post("")
 async def submit_job(
     user_id: Annotated[str, Form(title="user id", examples=["google|3fse56a2"])],
@@ -41,7 +127,7 @@ async def submit_job(
         )
 
     async with JobService() as service:
-        file_path = await service.save_gcode_file(filename, await file.read())
+        file_path = await service.save_gcode_file(filename, upload_chunks(file))
 
         job = Job(
             user_id=user_id,
@@ -56,15 +142,33 @@ async def submit_job(
 @router.put("/{job_id}:approve", status_code=HTTPStatus.ACCEPTED)
 async def approve_order(job_id: int) -> None:
     async with JobService() as service:
-        job = await service.get_job(job_id)
-        await service.update_job(job, JobStatus.Approved)
+        status = await service.add_status_flag(job_id, JobStatus.Approved)
+
+    if status is None:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="job not found")
 
 
 @router.put("/{job_id}:cancel", status_code=HTTPStatus.ACCEPTED)
 async def cancel_order(job_id: int) -> None:
     async with JobService() as service:
-        job = await service.get_job(job_id)
-        await service.update_job(job, JobStatus.CancelIssued)
+        status = await service.add_status_flag(
+            job_id,
+            JobStatus.CancelIssued,
+            excluded=JobStatus.Cancelled | JobStatus.Picked,
+        )
+
+        if status is None:
+            try:
+                await service.get_job(job_id=job_id)
+            except NoResultFound:
+                raise HTTPException(
+                    status_code=HTTPStatus.NOT_FOUND, detail="job not found"
+                )
+
+            raise HTTPException(
+                status_code=HTTPStatus.CONFLICT,
+                detail="job is already cancelled or picked",
+            )
 
 
 # TODO: pickup job, validate by job status(cancelled or printed)
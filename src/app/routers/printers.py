@@ -1,21 +1,32 @@
 from collections.abc import Sequence
 from http import HTTPStatus
+from typing import Annotated
 
 import httpx
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel, Field, HttpUrl
-from starlette.background import BackgroundTask
 from starlette.responses import RedirectResponse
 
 from db.models import Printer
 from printer import PrinterApi
-from service import PrinterService
-from worker import LatestPrinterStatus, manager
+from service import JobService, PrinterService, camera_hub, printer_version
+from service.thumbnail import preview_path
+from ..etag import is_not_modified, make_etag, not_modified
+from worker import (
+    LatestPrinterStatus,
+    StatusChanges,
+    manager,
+    status_changes,
+    status_events,
+)
 
 router = APIRouter(prefix="/printers", tags=["printers"])
 
-_client = httpx.AsyncClient()
+MaxFps = Annotated[
+    float | None,
+    Query(gt=0, description="max frames per second of the stream, for slow links"),
+]
 
 
 class HttpPrinterService(PrinterService):
@@ -59,18 +70,15 @@ class HttpPrinterService(PrinterService):
         printer_id: int | None = None,
         group_name: str | None = None,
         opcua_name: str | None = None,
+        fps: float | None = None,
     ) -> StreamingResponse:
         camera_url = await self.get_printer_camera_url(
             printer_id=printer_id, group_name=group_name, opcua_name=opcua_name
         )
 
-        req = _client.build_request("GET", camera_url + "/?action=stream")
-        resp = await _client.send(req, stream=True)
-
         return StreamingResponse(
-            content=resp.aiter_bytes(),
-            headers=resp.headers,
-            background=BackgroundTask(resp.aclose),
+            content=camera_hub.stream(camera_url, fps=fps),
+            media_type=camera_hub.media_type,
         )
 
     async def camera_snapshot(
@@ -83,45 +91,113 @@ class HttpPrinterService(PrinterService):
             printer_id=printer_id, group_name=group_name, opcua_name=opcua_name
         )
 
-        req = _client.build_request("GET", camera_url + "/?action=snapshot")
-        resp = await _client.send(req)
+        try:
+            snapshot = await camera_hub.snapshot(camera_url)
+        except httpx.HTTPError:
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_GATEWAY,
+                detail="cannot get a snapshot from the camera",
+            )
+
+        return Response(content=snapshot, media_type="image/jpeg")
 
-        return Response(
-            content=resp.content,
-            headers=resp.headers,
-            background=BackgroundTask(resp.aclose),
-        )
 
+def json_response(content: bytes, etag: str | None = None) -> Response:
+    """
+    Send pre-encoded JSON without going through the response model.
+    """
+    headers = None if etag is None else {"ETag": etag}
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("", response_model=Sequence[Printer])
+async def get_printers(
+    request: Request, response: Response, group: str | None = None
+) -> Sequence[Printer] | Response:
+    etag = make_etag("printers", printer_version.value)
+
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    response.headers["ETag"] = etag
 
-@router.get("")
-async def get_printers(group: str | None = None) -> Sequence[Printer]:
     async with HttpPrinterService() as service:
         return await service.get_printers(group_name=group)
 
 
-@router.get("/{printer_id}")
-async def get_printer_by_id(printer_id: int) -> Printer:
-    async with HttpPrinterService() as service:
-        return await service.get_printer(printer_id=printer_id)
+@router.get("/status", response_model=dict[int, LatestPrinterStatus | None])
+async def get_printer_statuses(request: Request, group: str | None = None) -> Response:
+    etag = make_etag("statuses", status_changes.seq)
 
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-@router.get("/{printer_id}/status")
-async def get_printer_status_by_id(printer_id: int) -> LatestPrinterStatus | None:
+    return json_response(manager.get_printer_statuses_json(group_name=group), etag)
+
+
+@router.get("/status/changes")
+async def get_printer_status_changes(since: int = 0) -> StatusChanges:
+    return status_changes.changes_since(since)
+
+
+@router.get("/status/events")
+async def printer_status_events(group: str | None = None) -> StreamingResponse:
+    return StreamingResponse(
+        status_events.stream(group_name=group), media_type="text/event-stream"
+    )
+
+
+@router.get("/{printer_id}", response_model=Printer)
+async def get_printer_by_id(
+    printer_id: int, request: Request, response: Response
+) -> Printer | Response:
+    # unknown printers are not found whatever the client has
     async with HttpPrinterService() as service:
         printer = await service.get_printer(printer_id=printer_id)
 
-        worker = manager.get_printer_worker(printer.id)
+    etag = make_etag("printer", printer_id, printer_version.value)
 
-        if worker is None:
-            return None
+    if is_not_modified(request, etag):
+        return not_modified(etag)
 
-        return await worker.printer_status()
+    response.headers["ETag"] = etag
+    return printer
+
+
+@router.get("/{printer_id}/status", response_model=LatestPrinterStatus | None)
+async def get_printer_status_by_id(printer_id: int, request: Request) -> Response:
+    worker = manager.get_printer_worker(printer_id)
+
+    if worker is None:
+        async with HttpPrinterService() as service:
+            await service.get_printer(printer_id=printer_id)
+        return json_response(b"null")
+
+    await worker.printer_status()
+    etag = make_etag("status", printer_id, worker.status_seq)
+
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return json_response(worker.cached_status_json, etag)
+
+
+@router.get("/{printer_id}/status/events")
+async def printer_status_events_by_id(printer_id: int) -> StreamingResponse:
+    async with HttpPrinterService() as service:
+        printer = await service.get_printer(printer_id=printer_id)
+
+    return StreamingResponse(
+        status_events.stream(printer_id=printer.id), media_type="text/event-stream"
+    )
 
 
 @router.get("/{printer_id}/camera/stream")
-async def printer_camera_stream_by_id(printer_id: int) -> StreamingResponse:
+async def printer_camera_stream_by_id(
+    printer_id: int, fps: MaxFps = None
+) -> StreamingResponse:
     async with HttpPrinterService() as service:
-        return await service.camera_stream(printer_id=printer_id)
+        return await service.camera_stream(printer_id=printer_id, fps=fps)
 
 
 @router.get("/{printer_id}/camera/snapshot")
@@ -136,23 +212,36 @@ async def get_printer_by_opcua_name(name: str) -> Printer:
         return await service.get_printer(opcua_name=name)
 
 
-@router.get("/opcua/{name}/status")
-async def get_printer_status_by_opcua_name(name: str) -> LatestPrinterStatus | None:
+@router.get("/opcua/{name}/status", response_model=LatestPrinterStatus | None)
+async def get_printer_status_by_opcua_name(name: str) -> Response:
     async with HttpPrinterService() as service:
         printer = await service.get_printer(opcua_name=name)
 
         worker = manager.get_printer_worker(printer.id)
 
         if worker is None:
-            return None
+            return json_response(b"null")
+
+        await worker.printer_status()
+        return json_response(worker.cached_status_json)
 
-        return await worker.printer_status()
+
+@router.get("/opcua/{name}/status/events")
+async def printer_status_events_by_opcua_name(name: str) -> StreamingResponse:
+    async with HttpPrinterService() as service:
+        printer = await service.get_printer(opcua_name=name)
+
+    return StreamingResponse(
+        status_events.stream(printer_id=printer.id), media_type="text/event-stream"
+    )
 
 
 @router.get("/opcua/{name}/camera/stream")
-async def printer_camera_stream_by_opcua_name(name: str) -> StreamingResponse:
+async def printer_camera_stream_by_opcua_name(
+    name: str, fps: MaxFps = None
+) -> StreamingResponse:
     async with HttpPrinterService() as service:
-        return await service.camera_stream(opcua_name=name)
+        return await service.camera_stream(opcua_name=name, fps=fps)
 
 
 @router.get("/opcua/{name}/camera/snapshot")
@@ -162,9 +251,24 @@ async def printer_camera_snapshot_by_opcua_name(name: str) -> Response:
 
 
 @router.get("/opcua/{name}/preview")
-async def get_model_preview_by_opcua_name(name: str) -> RedirectResponse:
+async def get_model_preview_by_opcua_name(
+    name: str, request: Request
+) -> RedirectResponse:
     async with HttpPrinterService() as service:
         printer = await service.get_printer(opcua_name=name)
+        assert printer.id is not None
+
+        # prefer the preview extracted from the uploaded file, it doesn't call the printer
+        job = await JobService(service.db).current_printer_job(printer.id)
+
+        if (
+            job is not None
+            and job.gcode_file_path is not None
+            and preview_path(job.gcode_file_path) is not None
+        ):
+            return RedirectResponse(
+                url=str(request.url_for("get_job_preview", job_id=job.id))
+            )
 
         stat = await manager.get_printer_status(printer.id)
 
@@ -2,6 +2,7 @@ from datetime import datetime
 from enum import Flag
 from pathlib import Path
 from filamentModels import UserFilament
+from sqlalchemy import Boolean, Column, Computed, Index
 from sqlmodel import Field, Relationship, SQLModel
 from printer import PrinterApi
 
@@ -70,7 +71,22 @@ class JobStatus(Flag):
     ToPrint = ToSchedule | Scheduled
 
 
+# a job is active from being scheduled until it is picked from the printer bed
+JOB_IS_ACTIVE_SQL = (
+    f"status > {JobStatus.Scheduled.value} AND (status & {JobStatus.Picked.value}) = 0"
+)
+
+
 class Job(IntPK, table=True):
+    __table_args__ = (
+        # current job of printers
+        Index("ix_job_printer_id_is_active", "printer_id", "is_active"),
+        # unscheduled, scheduled and pending jobs
+        Index("ix_job_status_printer_id", "status", "printer_id"),
+    )
+    # load is_active after inserts and updates
+    __mapper_args__ = {"eager_defaults": True}
+
     # a job may not have an order id or user id if it is submitted to the printer directly
     order_id: int | None = Field(foreign_key="order.id", default=None)
     user_id: str | None = Field(foreign_key="user.id", default=None)
@@ -81,6 +97,13 @@ class Job(IntPK, table=True):
     original_filename: str | None = Field(default=None)
     printer_filename: str | None = Field(default=None)
     start_time: datetime | None = Field(default=None)
+    is_active: bool | None = Field(
+        default=None,
+        description="derived from status by the database, None if the job is not saved",
+        sa_column=Column(
+            Boolean, Computed(JOB_IS_ACTIVE_SQL, persisted=True), nullable=False
+        ),
+    )
 
     def add_status_flag(self, status: JobStatus) -> None:
         self.status |= status.value
@@ -1,5 +1,8 @@
+import asyncio
 from pathlib import Path
 
+import httpx
+
 from printer.core import BaseHttpPrinter
 from printer.models import LatestJob, PrinterState, PrinterStatus, Temperature
 from printer.octo.models import CurrentJob, OctoPrinterStatus, StateFlags
@@ -25,27 +28,44 @@ class OctoPrinter(BaseHttpPrinter):
         resp.raise_for_status()
 
     async def current_status(self) -> PrinterStatus:
-        url = self.url + "/api/printer"
-        resp = await self.client.get(url, headers={"X-Api-Key": self.api_key})
-        resp.raise_for_status()
+        # /api/printer and /api/job are independent, fetch them concurrently
+        printer_result, job_result = await asyncio.gather(
+            self.printer_state(), self.latest_job(), return_exceptions=True
+        )
 
-        model: OctoPrinterStatus = OctoPrinterStatus.model_validate_json(resp.text)
+        if isinstance(printer_result, BaseException):
+            raise printer_result
 
-        assert model.temperature is not None
+        assert printer_result.temperature is not None
 
-        bed, noz = model.temperature.bed, model.temperature.tool0
+        bed, noz = printer_result.temperature.bed, printer_result.temperature.tool0
 
         assert bed is not None and noz is not None
 
-        job = await self.latest_job()
+        state = parse_state(printer_result.state.flags)
+        temp_bed = Temperature(actual=bed.actual or 0, target=bed.target or 0)
+        temp_nozzle = Temperature(actual=noz.actual or 0, target=noz.target or 0)
+
+        if isinstance(job_result, httpx.HTTPError):
+            # without the job state, a printing printer would look idle and
+            # the worker would drop its job, so report an error instead
+            return PrinterStatus(
+                state=PrinterState.Error, temp_bed=temp_bed, temp_nozzle=temp_nozzle
+            )
+        elif isinstance(job_result, BaseException):
+            raise job_result
 
         return PrinterStatus(
-            state=parse_state(model.state.flags),
-            temp_bed=Temperature(actual=bed.actual or 0, target=bed.target or 0),
-            temp_nozzle=Temperature(actual=bed.actual or 0, target=bed.target or 0),
-            job=job,
+            state=state, temp_bed=temp_bed, temp_nozzle=temp_nozzle, job=job_result
         )
 
+    async def printer_state(self) -> OctoPrinterStatus:
+        url = self.url + "/api/printer"
+        resp = await self.client.get(url, headers={"X-Api-Key": self.api_key})
+        resp.raise_for_status()
+
+        return OctoPrinterStatus.model_validate_json(resp.text)
+
     async def upload_file(self, gcode_path: str) -> None:
         url = self.url + "/api/files/local"
         resp = await self.client.post(
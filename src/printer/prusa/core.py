@@ -2,10 +2,11 @@ from pathlib import Path
 
 import httpx
 import rapidjson
+from pydantic import HttpUrl
 
 from printer.core import BaseHttpPrinter
 from printer.models import LatestJob, PrinterState, PrinterStatus, Temperature
-from printer.prusa.models import CurrentJob, Status
+from printer.prusa.models import CurrentJob, JobStatus, Status
 
 
 def parse_state(state: str) -> PrinterState:
@@ -21,6 +22,11 @@ def parse_state(state: str) -> PrinterState:
 
 
 class PrusaPrinter(BaseHttpPrinter):
+    def __init__(self, url: str | HttpUrl, api_key: str | None = None) -> None:
+        super().__init__(url, api_key)
+        # details of the latest job from /api/v1/job, only refreshed when job id changes
+        self._job_cache: LatestJob | None = None
+
     async def connect(self) -> None:
         return
 
@@ -32,7 +38,7 @@ class PrusaPrinter(BaseHttpPrinter):
         model: Status = Status.model_validate_json(resp.text)
 
         printer = model.printer
-        job = await self.latest_job()
+        job = await self._current_job(model.job)
 
         return PrinterStatus(
             state=parse_state(model.printer.state),
@@ -43,6 +49,34 @@ class PrusaPrinter(BaseHttpPrinter):
             job=job,
         )
 
+    async def _current_job(self, status: JobStatus | None) -> LatestJob | None:
+        """
+        Build the current job from the job state in /api/v1/status.
+
+        /api/v1/job is only called when the job id changes to get the file name
+        and thumbnail, since progress and times are included in the status.
+        :param status: job state in the status payload
+        :return: current job or None if the printer has no job
+        """
+        if status is None or status.id is None:
+            return None
+
+        if self._job_cache is None or self._job_cache.id != status.id:
+            self._job_cache = await self.latest_job()
+
+            if self._job_cache is None:
+                return None
+
+        job = self._job_cache
+        update: dict[str, float | int] = {"progress": status.progress or 0.0}
+
+        if status.time_printing is not None:
+            update["time_used"] = status.time_printing
+        if status.time_remaining is not None:
+            update["time_left"] = status.time_remaining
+
+        return job.model_copy(update=update)
+
     async def upload_file(self, gcode_path: str) -> None:
         filename = Path(gcode_path).name
         file = open(gcode_path, "rb")
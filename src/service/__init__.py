@@ -1,12 +1,23 @@
 __all__ = [
     "PrinterService",
+    "printer_version",
     "JobService",
     "BaseDbService",
     "OpcuaService",
     "opcua_service",
+    "JobWriter",
+    "get_job_writer",
+    "close_job_writer",
+    "CameraHub",
+    "camera_hub",
+    "Timelapse",
+    "TimelapseRecorder",
 ]
 
-from .printer import PrinterService
+from .printer import PrinterService, printer_version
 from .job import JobService
 from .db import BaseDbService
 from .opcua import opcua_service, OpcuaService
+from .writer import JobWriter, get_job_writer, close_job_writer
+from .camera import CameraHub, camera_hub
+from .timelapse import Timelapse, TimelapseRecorder
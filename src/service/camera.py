@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+import httpx
+
+from setting import app_settings
+from task import SingleFlight
+
+BOUNDARY = "frame"
+
+
+class MjpegParser:
+    def __init__(self, boundary: str, max_frame_size: int | None = None) -> None:
+        """
+        Splits a multipart/x-mixed-replace MJPEG stream into JPEG frames.
+
+        Parts without Content-Length end at the next boundary, bytes searched for the boundary
+        are not searched again, and the buffer is dropped if it exceeds max_frame_size.
+        :param boundary: multipart boundary in the content type of the stream
+        :param max_frame_size: max bytes of a frame, bytes of larger frames are discarded
+        """
+        self.delimiter: bytes = b"--" + boundary.encode()
+        self.max_frame_size: int = max_frame_size or app_settings.camera_max_frame_size
+        self._buffer: bytearray = bytearray()
+        # the end of a part without length is searched from here, bytes before are scanned
+        self._scan: int = 0
+
+    @staticmethod
+    def boundary(content_type: str) -> str | None:
+        """
+        Get the multipart boundary of a content type.
+        :param content_type: e.g. `multipart/x-mixed-replace;boundary=boundarydonotcross`
+        :return: the boundary or None if there is no boundary
+        """
+        for param in content_type.split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "boundary":
+                return value.strip('"')
+        return None
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """
+        Feed bytes of the stream.
+        :param chunk: next bytes of the stream
+        :return: frames completed by the chunk
+        """
+        self._buffer += chunk
+        frames = []
+
+        while (frame := self._next_frame()) is not None:
+            frames.append(frame)
+
+        if len(self._buffer) > self.max_frame_size:
+            self._buffer.clear()
+            self._scan = 0
+
+        return frames
+
+    def _next_frame(self) -> bytes | None:
+        buf = self._buffer
+        start = buf.find(self.delimiter)
+        if start < 0:
+            # bytes before a part are dropped, except a partial delimiter
+            del buf[: max(len(buf) - len(self.delimiter) + 1, 0)]
+            return None
+        elif start > 0:
+            del buf[:start]
+            start = 0
+
+        headers_end = buf.find(b"\r\n\r\n", start)
+        if headers_end < 0:
+            return None
+
+        body_start = headers_end + 4
+        length = self._content_length(bytes(buf[start:headers_end]))
+
+        if length is not None:
+            body_end = body_start + length
+            if len(buf) < body_end:
+                return None
+            frame = bytes(buf[body_start:body_end])
+        else:
+            body_end = buf.find(self.delimiter, max(body_start, self._scan))
+            if body_end < 0:
+                # the delimiter may start in the last bytes and end in the next chunk
+                self._scan = max(body_start, len(buf) - len(self.delimiter) + 1)
+                return None
+            frame = bytes(buf[body_start:body_end]).rstrip(b"\r\n")
+
+        del buf[:body_end]
+        self._scan = 0
+        return frame
+
+    @staticmethod
+    def _content_length(headers: bytes) -> int | None:
+        for line in headers.split(b"\r\n")[1:]:
+            key, _, value = line.partition(b":")
+            if key.strip().lower() == b"content-length":
+                return int(value)
+        return None
+
+
+def multipart_frame(frame: bytes) -> bytes:
+    """
+    Encode a JPEG frame as a part of a multipart/x-mixed-replace response.
+    """
+    headers = b"Content-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(frame)
+    return b"--" + BOUNDARY.encode() + b"\r\n" + headers + frame + b"\r\n"
+
+
+class FrameSubscriber:
+    def __init__(self) -> None:
+        """
+        Latest frame of a camera feed not sent to a viewer yet,
+        a slow viewer skips frames instead of buffering them.
+        """
+        self.dropped: int = 0
+        self._queue: asyncio.Queue[bytes | None] = asyncio.Queue(1)
+
+    def put(self, frame: bytes | None) -> None:
+        """
+        :param frame: a JPEG frame, None if the feed is closed
+        """
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+
+        self._queue.put_nowait(frame)
+
+    async def get(self) -> bytes | None:
+        return await self._queue.get()
+
+
+class CameraFeed:
+    def __init__(self, url: str, client: httpx.AsyncClient) -> None:
+        """
+        One upstream MJPEG stream of a camera shared by all viewers.
+
+        The upstream is opened by the first viewer and closed when the last viewer leaves.
+        :param url: url of the camera
+        :param client: HTTP client
+        """
+        self.url: str = url
+        self.client: httpx.AsyncClient = client
+        self.logger: logging.Logger = logging.getLogger(f"CameraFeed({url})")
+
+        self.subscribers: set[FrameSubscriber] = set()
+        self.frames: int = 0
+        self._task: asyncio.Task[None] | None = None
+
+        # latest frame of the stream or a snapshot, and the loop time it is received
+        self.latest_frame: bytes | None = None
+        self.latest_frame_time: float = 0
+        self._snapshot_flight: SingleFlight[bytes] = SingleFlight()
+
+    @property
+    def is_open(self) -> bool:
+        return self._task is not None
+
+    def subscribe(self) -> FrameSubscriber:
+        subscriber = FrameSubscriber()
+        self.subscribers.add(subscriber)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: FrameSubscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+        if len(self.subscribers) == 0 and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, frame: bytes | None) -> None:
+        if frame is not None:
+            self.frames += 1
+            self._set_latest_frame(frame)
+
+        for subscriber in self.subscribers:
+            subscriber.put(frame)
+
+    def _set_latest_frame(self, frame: bytes) -> None:
+        self.latest_frame = frame
+        self.latest_frame_time = asyncio.get_running_loop().time()
+
+    async def snapshot(self, ttl: float | None = None) -> bytes:
+        """
+        Get a JPEG snapshot of the camera.
+
+        The latest frame is returned if it is not older than `ttl` seconds,
+        it is refreshed by the stream while the feed is open.
+        Otherwise, concurrent callers share one snapshot request.
+        :param ttl: max age of the latest frame in seconds
+        :return: JPEG bytes
+        """
+        ttl = app_settings.camera_snapshot_ttl if ttl is None else ttl
+        age = asyncio.get_running_loop().time() - self.latest_frame_time
+
+        if self.latest_frame is not None and age <= ttl:
+            return self.latest_frame
+
+        return await self._snapshot_flight.run(self._fetch_snapshot)
+
+    async def _fetch_snapshot(self) -> bytes:
+        resp = await self.client.get(self.url + "/?action=snapshot")
+        resp.raise_for_status()
+
+        self._set_latest_frame(resp.content)
+        return resp.content
+
+    async def _run(self) -> None:
+        self.logger.info("open upstream")
+
+        try:
+            async with self.client.stream("GET", self.url + "/?action=stream") as resp:
+                resp.raise_for_status()
+                boundary = MjpegParser.boundary(resp.headers.get("content-type", ""))
+
+                if boundary is None:
+                    raise ValueError("camera response is not a multipart stream")
+
+                parser = MjpegParser(boundary)
+
+                async for chunk in resp.aiter_bytes():
+                    for frame in parser.feed(chunk):
+                        self.publish(frame)
+        except asyncio.CancelledError:
+            self.logger.info("close upstream, no viewers")
+            raise
+        except (httpx.HTTPError, ValueError) as e:
+            self.logger.error("upstream failed, error type=%s", type(e))
+
+        # let viewers end their streams
+        self._task = None
+        self.publish(None)
+
+
+class CameraHub:
+    media_type: str = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+    def __init__(self, client: httpx.AsyncClient | None = None) -> None:
+        """
+        Camera feeds of all cameras, keyed by camera url.
+        :param client: HTTP client of upstream streams
+        """
+        self.client: httpx.AsyncClient = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(5, read=30)
+        )
+        self.feeds: dict[str, CameraFeed] = {}
+
+    def feed(self, url: str) -> CameraFeed:
+        if url not in self.feeds:
+            self.feeds[url] = CameraFeed(url, self.client)
+        return self.feeds[url]
+
+    async def snapshot(self, url: str) -> bytes:
+        """
+        Get a JPEG snapshot of a camera, see CameraFeed.snapshot.
+        :param url: url of the camera
+        :return: JPEG bytes
+        """
+        return await self.feed(url).snapshot()
+
+    async def stream(self, url: str, fps: float | None = None) -> AsyncIterator[bytes]:
+        """
+        Subscribe to a camera as a multipart/x-mixed-replace stream with boundary `BOUNDARY`.
+        The viewer is unsubscribed when the stream is closed.
+
+        If `fps` is set, frames received between two sent frames are skipped,
+        only the latest one is kept, so a viewer never uses more than `fps` frames of bandwidth.
+        :param url: url of the camera
+        :param fps: max frames sent per second, all frames are sent if is None
+        :return: parts of the stream
+        """
+        feed = self.feed(url)
+        subscriber = feed.subscribe()
+        interval = 0 if fps is None else 1 / fps
+
+        try:
+            while (frame := await subscriber.get()) is not None:
+                yield multipart_frame(frame)
+
+                if interval > 0:
+                    await asyncio.sleep(interval)
+        finally:
+            feed.unsubscribe(subscriber)
+
+
+camera_hub: CameraHub = CameraHub()
@@ -1,17 +1,148 @@
+import logging
 import secrets
-from collections.abc import Sequence
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 import aiofiles
-from sqlalchemy import true, ColumnOperators
+from sqlalchemy import true, update, ColumnOperators
+from sqlalchemy.exc import NoResultFound, SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import select, null
 
+from db import DatabaseSession
 from db.models import Job, JobStatus, JobHistory
 from setting import app_settings
 from .db import BaseDbService
+from .thumbnail import GCODE_SUFFIXES, ThumbnailParser
+from .writer import JobWriter
+
+
+class ActiveJobCache:
+    """
+    Current job of each printer, None if the printer has no current job.
+
+    Services of printer workers write their job changes through the cache,
+    other services invalidate entries of printers whose jobs they changed.
+    """
+
+    def __init__(self) -> None:
+        self._jobs: dict[int, Job | None] = {}
+
+    def __contains__(self, printer_id: int) -> bool:
+        return printer_id in self._jobs
+
+    def get(self, printer_id: int) -> Job | None:
+        return self._jobs.get(printer_id)
+
+    def put(self, printer_id: int, job: Job | None) -> None:
+        self._jobs[printer_id] = job
+
+    def invalidate(self, printer_id: int) -> None:
+        self._jobs.pop(printer_id, None)
+
+    def clear(self) -> None:
+        self._jobs.clear()
+
+
+active_jobs: ActiveJobCache = ActiveJobCache()
+
+
+def is_current_job(job: Job) -> bool:
+    return job.status > JobStatus.Scheduled.value and not job.is_picked()
 
 
 class JobService(BaseDbService):
+    def __init__(
+        self,
+        db: DatabaseSession | None = None,
+        cache_active_jobs: bool = False,
+        writer: JobWriter | None = None,
+    ) -> None:
+        """
+        :param db: a database session, the service will use a new session if is None
+        :param cache_active_jobs: read current printer jobs from the active job cache and
+            write job changes through it, should only be enabled for services of printer workers
+        :param writer: write-behind writer of status-only job updates, updates are committed
+            immediately if is None
+        """
+        super().__init__(db)
+        self.cache_active_jobs: bool = cache_active_jobs
+        self.writer: JobWriter | None = writer
+        self.logger: logging.Logger = logging.getLogger("JobService")
+        self._in_batch: bool = False
+        # created and updated jobs of the batch, with the status flag to add
+        self._deferred: list[tuple[Job, JobStatus | None]] = []
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """
+        Defer writes of created and updated jobs in the context,
+        all changes are written in one transaction on exit.
+
+        No statement is executed for changed jobs in the context, so printer requests made
+        in the context don't hold database locks. Status flags of each job are added in a savepoint,
+        a job that fails to be updated doesn't roll back changes of other jobs.
+        """
+        self._in_batch = True
+        try:
+            with self.db.no_autoflush:
+                yield
+            await self._write_deferred()
+        except BaseException:
+            self._deferred.clear()
+            await self.db.rollback()
+            if self.cache_active_jobs:
+                active_jobs.clear()
+            raise
+        finally:
+            self._in_batch = False
+
+    async def _write_deferred(self) -> None:
+        deferred, self._deferred = self._deferred, []
+
+        # write changed columns and created jobs, then add status flags
+        await self.db.flush()
+
+        for job, flag in deferred:
+            if flag is not None:
+                assert job.id is not None
+
+                try:
+                    async with self.db.begin_nested():
+                        status = await self.add_status_flag(job.id, flag)
+
+                        if status is None:
+                            raise NoResultFound(f"job (id={job.id}) does not exist")
+
+                        await self.db.flush()
+                except SQLAlchemyError:
+                    self.logger.exception("failed to update job (id=%d)", job.id)
+
+                    if job.printer_id is not None:
+                        active_jobs.invalidate(job.printer_id)
+                    continue
+
+                self._set_committed_status(job, status)
+
+            self._cache_job(job)
+
+        await self.db.commit()
+
+    async def _commit(self) -> None:
+        if not self._in_batch:
+            await self.db.commit()
+
+    def _cache_job(self, job: Job) -> None:
+        if job.printer_id is None:
+            return
+
+        if self.cache_active_jobs and is_current_job(job):
+            active_jobs.put(job.printer_id, job)
+        else:
+            # let the printer worker reload the current job
+            active_jobs.invalidate(job.printer_id)
+
     async def get_job(
         self, job_id: int | None = None, printer_filename: str | None = None
     ) -> Job:
@@ -42,7 +173,13 @@ class JobService(BaseDbService):
 
     async def create_job(self, job: Job) -> None:
         self.db.add(job)
-        await self.db.commit()
+
+        if self._in_batch:
+            self._deferred.append((job, None))
+            return
+
+        await self._commit()
+        self._cache_job(job)
 
     async def unapproved_jobs(self) -> Sequence[Job]:
         """
@@ -101,32 +238,189 @@ class JobService(BaseDbService):
         :param printer_id: printer id
         :return: a Job instance or None
         """
+        jobs = await self.current_printer_jobs([printer_id])
+        return jobs.get(printer_id)
+
+    async def current_printer_jobs(self, printer_ids: Sequence[int]) -> dict[int, Job]:
+        """
+        Get current jobs of multiple printers in one query.
+        Cached jobs are returned without querying if the active job cache is enabled,
+        buffered writes of the write-behind writer are flushed before querying.
+        :param printer_ids: printer ids
+        :return: a dict mapping printer id to its current job, printers without a job are absent
+        """
         assert isinstance(Job.status, ColumnOperators)
+        assert isinstance(Job.printer_id, ColumnOperators)
 
-        stmt = select(Job).where(
-            Job.printer_id == printer_id,
-            Job.status > JobStatus.Scheduled.value,
-            Job.status.bitwise_and(JobStatus.Picked.value) == 0,
+        if self.cache_active_jobs:
+            cached = [pid for pid in printer_ids if pid in active_jobs]
+            missed = [pid for pid in printer_ids if pid not in active_jobs]
+        else:
+            cached, missed = [], list(printer_ids)
+
+        jobs = {pid: job for pid in cached if (job := active_jobs.get(pid)) is not None}
+
+        if len(missed) == 0:
+            return jobs
+
+        if self.writer is not None:
+            # buffered flags would be overwritten by the stale rows otherwise
+            await self.writer.flush()
+
+        stmt = (
+            select(Job)
+            .where(Job.printer_id.in_(missed), Job.is_active == true())
+            # the newest job wins if a printer has more than one active job
+            .order_by(Job.id)
+            # jobs may be updated by other sessions, e.g. cancelled through the API
+            .execution_options(populate_existing=True)
         )
         result = await self.db.exec(stmt)
-        return result.one_or_none()
+        loaded: dict[int, Job] = {}
+
+        for job in result.all():
+            if job.printer_id is None:
+                continue
+
+            if (older := loaded.get(job.printer_id)) is not None:
+                self.logger.warning(
+                    "printer %d has more than one active job, job %s is ignored",
+                    job.printer_id,
+                    older.id,
+                )
+
+            loaded[job.printer_id] = job
+
+        if self.cache_active_jobs:
+            for pid in missed:
+                active_jobs.put(pid, loaded.get(pid))
+
+        return jobs | loaded
 
     async def update_job(
-        self, job: Job, new_stats_flag: JobStatus | None = None
+        self, job: Job, new_stats_flag: JobStatus | None = None, wait: bool = False
     ) -> None:
         """
         Update job status and insert a job history record.
+
+        If the service has a write-behind writer and only the status is updated,
+        the update is buffered by the writer instead of being committed immediately.
         :param job: a Job instance which must be managed by the db session of this service
         :param new_stats_flag: new job status that will be added to the bitmask
+        :param wait: wait until a buffered update is committed
         """
-        if new_stats_flag is not None:
+        if new_stats_flag is not None and self._can_write_behind(job):
+            assert self.writer is not None and job.id is not None
+
+            # keep the change out of the session, the writer commits it
+            self._set_committed_status(job, job.status | new_stats_flag.value)
+            self.writer.submit(job.id, new_stats_flag)
+
+            if (
+                job.printer_id is not None
+                and active_jobs.get(job.printer_id) is not job
+            ):
+                # the entry is invalidated by another service, e.g. the job is cancelled,
+                # flags in the database are not merged into the job
+                active_jobs.invalidate(job.printer_id)
+            else:
+                self._cache_job(job)
+
+            if wait:
+                await self.writer.wait(job.id)
+            return
+
+        if new_stats_flag is not None and job.id is None:
             job.add_status_flag(new_stats_flag)
-            history = JobHistory(job_id=job.id, status=str(new_stats_flag))
-            self.db.add(history)
+            new_stats_flag = None
 
         self.db.add(job)
 
-        await self.db.commit()
+        if self._in_batch:
+            if new_stats_flag is not None:
+                # flags added by other sessions are merged when the batch is written
+                self._set_committed_status(job, job.status | new_stats_flag.value)
+            self._deferred.append((job, new_stats_flag))
+            return
+
+        if new_stats_flag is not None and job.id is not None:
+            # write other changed columns before the flag is added in SQL
+            await self.db.flush()
+            status = await self.add_status_flag(job.id, new_stats_flag)
+
+            if status is None:
+                raise NoResultFound(f"job (id={job.id}) does not exist")
+
+            # flags added by other sessions are loaded together with the new flag
+            self._set_committed_status(job, status)
+        else:
+            await self._commit()
+
+        self._cache_job(job)
+
+    async def add_status_flag(
+        self,
+        job_id: int,
+        flag: JobStatus,
+        expected: JobStatus | None = None,
+        excluded: JobStatus | None = None,
+    ) -> int | None:
+        """
+        Add a status flag to a job in one UPDATE statement and insert a job history record.
+
+        The flag is OR-ed into the status in SQL, so flags added by concurrent
+        sessions are never overwritten and the job doesn't need to be loaded first.
+        :param job_id: job id
+        :param flag: new job status that will be added to the bitmask
+        :param expected: only update the job if it has all of these status flags
+        :param excluded: only update the job if it has none of these status flags
+        :return: new status bitmask, or None if no job is updated
+        """
+        table = Job.__table__  # type: ignore[attr-defined]
+        stmt = (
+            update(table)
+            .where(table.c.id == job_id)
+            .values(status=table.c.status.bitwise_or(flag.value))
+            .returning(table.c.status, table.c.printer_id)
+        )
+
+        if expected is not None:
+            stmt = stmt.where(
+                table.c.status.bitwise_and(expected.value) == expected.value
+            )
+
+        if excluded is not None:
+            stmt = stmt.where(table.c.status.bitwise_and(excluded.value) == 0)
+
+        result = await self.db.exec(stmt)  # type: ignore[call-overload]
+        row = result.one_or_none()
+
+        if row is None:
+            return None
+
+        status, printer_id = row
+        self.db.add(JobHistory(job_id=job_id, status=str(flag)))
+        await self._commit()
+
+        if printer_id is not None and not self.cache_active_jobs:
+            active_jobs.invalidate(printer_id)
+
+        return status
+
+    @staticmethod
+    def _set_committed_status(job: Job, status: int) -> None:
+        # is_active is derived from status by the database
+        set_committed_value(job, "status", status)
+        set_committed_value(job, "is_active", is_current_job(job))
+
+    def _can_write_behind(self, job: Job) -> bool:
+        return (
+            self.writer is not None
+            and not self.writer.closed
+            and job.id is not None
+            and job in self.db
+            and not self.db.is_modified(job)
+        )
 
     @staticmethod
     def generate_filename() -> str:
@@ -138,11 +432,43 @@ class JobService(BaseDbService):
         """
         return f"server-{secrets.token_hex(6)}"
 
-    async def save_gcode_file(self, filename: str, content: bytes) -> Path:
+    async def save_gcode_file(
+        self, filename: str, content: bytes | AsyncIterable[bytes]
+    ) -> Path:
+        """
+        Save a gcode file to the upload path.
+
+        Thumbnails embedded in a plain text gcode file are extracted while the file is written,
+        the best one is saved next to the file as `<name>.preview.<format>`.
+        :param filename: original filename
+        :param content: content of the file, or chunks of it
+        :return: path of the saved file
+        """
         filename = self.generate_filename() + Path(filename).suffix
         file_path = app_settings.upload_path / filename
+        parser = (
+            ThumbnailParser() if file_path.suffix.lower() in GCODE_SUFFIXES else None
+        )
+
+        if isinstance(content, bytes):
+            content = _single_chunk(content)
 
         async with aiofiles.open(file_path, "wb") as f:
-            await f.write(content)
+            async for chunk in content:
+                await f.write(chunk)
+
+                if parser is not None:
+                    parser.feed(chunk)
+
+        if parser is not None and parser.best is not None:
+            thumbnail = parser.best
+            preview = file_path.with_suffix(".preview" + thumbnail.suffix)
+
+            async with aiofiles.open(preview, "wb") as f:
+                await f.write(thumbnail.data)
 
         return file_path
+
+
+async def _single_chunk(content: bytes) -> AsyncIterator[bytes]:
+    yield content
@@ -1,10 +1,15 @@
-from typing import Self
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Self
 
 from mes_opcua_server.models import Printer as OpcuaPrinter
 from opcuax import OpcuaClient
 from opcuax.model import TBaseModel, TOpcuaModel
+from typing_extensions import override
 
 from setting import app_settings
+from task import PeriodicTask
 
 
 class MockOpcuaClient(OpcuaClient):
@@ -30,10 +35,82 @@ class MockOpcuaClient(OpcuaClient):
         return
 
 
+class OpcuaFlusher(PeriodicTask):
+    def __init__(self, service: "OpcuaService", interval_secs: float) -> None:
+        """
+        Commits updates queued by all OPC UA objects in one commit every interval.
+        :param service: OPC UA service
+        :param interval_secs: seconds between two commits
+        """
+        super().__init__(interval_secs, name="OpcuaFlusher")
+        self.service: OpcuaService = service
+
+        self.flushes: int = 0
+        self.queue_depth: int = 0
+        self.max_queue_depth: int = 0
+        self.flush_latency: float = 0
+        self.max_flush_latency: float = 0
+
+    @override
+    async def step(self) -> None:
+        await self.flush()
+
+    async def flush(self) -> None:
+        depth = self.service.queue_depth
+
+        if depth == 0 or not self.service.online:
+            return
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        if not await self.service.flush():
+            return
+
+        latency = loop.time() - start
+        self.flushes += 1
+        self.queue_depth, self.flush_latency = depth, latency
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+
+        if latency > self.interval_secs:
+            self.logger.warning(
+                "committing %d updates took %.3fs, longer than the interval",
+                depth,
+                latency,
+            )
+        else:
+            self.logger.debug("committed %d updates in %.3fs", depth, latency)
+
+
 class OpcuaService:
-    def __init__(self):
+    def __init__(self, batch_commit: bool | None = None):
+        """
+        Publishes objects to the OPC UA server.
+
+        If a commit fails, the service reconnects to the server with exponential backoff.
+        While it is offline, only the latest value of each updated field is buffered,
+        buffered values are written once the service is reconnected.
+        Since the server may have lost written values, `generation` is changed when the service
+        goes offline or reconnects, publishers should write their full state again.
+        :param batch_commit: if True, commit() returns immediately and queued updates
+            of all objects are committed together by a flusher every OPCUA_COMMIT_INTERVAL seconds
+        """
         self._client: OpcuaClient = self.create_opcua_client()
         self._connected: bool = False
+        self.online: bool = False
+        self.batch_commit: bool = (
+            app_settings.opcua_batch_commit if batch_commit is None else batch_commit
+        )
+        self.flusher: OpcuaFlusher | None = None
+        self.logger: logging.Logger = logging.getLogger("OpcuaService")
+
+        # (object id, field path) -> (object, latest value)
+        self._buffer: OrderedDict[tuple[int, str], tuple[Any, Any]] = OrderedDict()
+        self.dropped_updates: int = 0
+        self._reconnect_task: asyncio.Task[None] | None = None
+        # changed when the service goes offline or reconnects, values written before may be lost
+        self.generation: int = 0
 
     @staticmethod
     def create_opcua_client() -> OpcuaClient:
@@ -45,23 +122,148 @@ class OpcuaService:
         else:
             return OpcuaClient(endpoint=url, namespace=ns)
 
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of updates waiting for a commit.
+        """
+        return self._client.update_tasks.qsize() + len(self._buffer)
+
     async def connect(self) -> None:
         await self._client.__aenter__()
         self._connected = True
+        self.online = True
+
+        if self.batch_commit:
+            self.flusher = OpcuaFlusher(self, app_settings.opcua_commit_interval)
+            self.flusher.start()
 
     async def get_printer(self, name: str) -> OpcuaPrinter:
         if not self._connected:
             raise RuntimeError("OpcuaService should be connected before use")
         return await self._client.get_object(OpcuaPrinter, name)
 
+    def update(self, obj: Any, values: dict[str, Any]) -> None:
+        """
+        Set fields of an OPC UA object, the changes are written by the next commit.
+
+        Values are buffered if the service is offline.
+        :param obj: an OPC UA object returned by the client
+        :param values: new values, keys are field paths like `bed.actual`
+        """
+        if self.online:
+            self._set(obj, values)
+            return
+
+        for path, value in values.items():
+            key = (id(obj), path)
+            self._buffer.pop(key, None)
+            self._buffer[key] = (obj, value)
+
+        while len(self._buffer) > app_settings.opcua_buffer_size:
+            self._buffer.popitem(last=False)
+            self.dropped_updates += 1
+
+    @staticmethod
+    def _set(obj: Any, values: dict[str, Any]) -> None:
+        for path, value in values.items():
+            *parents, field = path.split(".")
+            node = obj
+
+            for parent in parents:
+                node = getattr(node, parent)
+
+            setattr(node, field, value)
+
     async def commit(self) -> None:
+        """
+        Commit queued updates, or leave them to the flusher in batch commit mode.
+
+        Failures are not raised to callers, the service goes offline and reconnects in background.
+        """
         if not self._connected:
             raise RuntimeError("OpcuaService should be connected before use")
-        await self._client.commit()
+
+        if self.online and self.flusher is None:
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        Commit queued updates now, regardless of the batch commit mode.
+
+        A failed commit is not raised, the service goes offline and reconnects in background.
+        :return: True if the updates are committed
+        """
+        try:
+            await self._client.commit()
+        except Exception:
+            if self.online:
+                self.logger.exception("failed to commit, reconnecting")
+                self.online = False
+                self.generation += 1
+                self._reconnect_task = asyncio.create_task(self._reconnect())
+            return False
+
+        return True
+
+    async def _reconnect(self) -> None:
+        delay = app_settings.opcua_reconnect_min_delay
+
+        while self._connected:
+            await asyncio.sleep(delay)
+
+            try:
+                await self._client.__aexit__(None, None, None)
+            except Exception:
+                self.logger.debug("failed to close the old connection", exc_info=True)
+
+            try:
+                await self._client.__aenter__()
+            except Exception as e:
+                self.logger.warning(
+                    "failed to reconnect, error type=%s, retry in %.1fs", type(e), delay
+                )
+                delay = min(delay * 2, app_settings.opcua_reconnect_max_delay)
+                continue
+
+            self.logger.info(
+                "reconnected, replaying %d buffered updates (%d dropped)",
+                len(self._buffer),
+                self.dropped_updates,
+            )
+            self.online = True
+            self.generation += 1
+            self._replay()
+            break
+
+        self._reconnect_task = None
+
+        if self.online and self.flusher is None:
+            await self.flush()
+
+    def _replay(self) -> None:
+        for (_, path), (obj, value) in self._buffer.items():
+            self._set(obj, {path: value})
+
+        self._buffer.clear()
+        self.dropped_updates = 0
 
     async def close(self):
-        await self._client.__aexit__(None, None, None)
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+        if self.flusher is not None:
+            # wait for a running commit, then commit updates queued since
+            await self.flusher.close()
+            await self.flusher.flush()
+            self.flusher = None
+
+        if self.online:
+            await self._client.__aexit__(None, None, None)
+
         self._connected = False
+        self.online = False
 
 
 opcua_service: OpcuaService = OpcuaService()
@@ -6,6 +6,21 @@ from .db import BaseDbService
 from db.models import Printer
 
 
+class PrinterVersion:
+    """
+    Version of all printer records, bumped on every change made through PrinterService.
+    """
+
+    def __init__(self) -> None:
+        self.value: int = 0
+
+    def bump(self) -> None:
+        self.value += 1
+
+
+printer_version: PrinterVersion = PrinterVersion()
+
+
 class PrinterService(BaseDbService):
     async def get_printers(
         self, group_name: str | None = None, has_worker: bool | None = None
@@ -40,6 +55,8 @@ class PrinterService(BaseDbService):
 
     async def create_printer(self, printer: Printer) -> None:
         await self.db.upsert(printer)
+        printer_version.bump()
 
     async def update_printer(self, printer: Printer) -> None:
         await self.db.upsert(printer)
+        printer_version.bump()
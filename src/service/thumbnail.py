@@ -0,0 +1,140 @@
+import base64
+import binascii
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+# `; thumbnail begin 300x300 12345` or `; thumbnail_QOI begin 300x300 12345`
+BEGIN = re.compile(rb"^;\s*thumbnail(?:_(\w+))?\s+begin\s+(\d+)x(\d+)")
+END = re.compile(rb"^;\s*thumbnail(?:_\w+)?\s+end")
+
+# suffixes of plain text gcode files, binary gcode files have no thumbnail comments
+GCODE_SUFFIXES = {".gcode", ".gco", ".g"}
+
+# lines of thumbnail blocks are short, longer lines are not in the header
+MAX_LINE_LENGTH = 4096
+# max base64 bytes of a thumbnail
+MAX_THUMBNAIL_SIZE = 4 * 1024 * 1024
+
+FORMATS: dict[str, tuple[str, str]] = {
+    "PNG": (".png", "image/png"),
+    "JPG": (".jpg", "image/jpeg"),
+    "QOI": (".qoi", "image/qoi"),
+}
+
+
+class Thumbnail(NamedTuple):
+    format: str
+    width: int
+    height: int
+    data: bytes
+
+    @property
+    def suffix(self) -> str:
+        return FORMATS[self.format][0]
+
+    def rank(self) -> tuple[bool, int]:
+        # browsers can't show QOI images, larger images are better previews
+        return self.format != "QOI", self.width * self.height
+
+
+class ThumbnailParser:
+    def __init__(self) -> None:
+        """
+        Extracts thumbnails embedded by slicers in comment blocks of a gcode file.
+
+        The file is fed in chunks, only the line and the thumbnail being read and the best
+        thumbnail so far are held in memory. Thumbnails are in the header, so parsing stops at
+        the first gcode command, at a line longer than `MAX_LINE_LENGTH` bytes,
+        or at a thumbnail larger than `MAX_THUMBNAIL_SIZE` bytes.
+        """
+        self.best: Thumbnail | None = None
+        self.done: bool = False
+
+        self._line: bytearray = bytearray()
+        self._header: tuple[str, int, int] | None = None
+        self._block: bytearray = bytearray()
+
+    def feed(self, chunk: bytes) -> None:
+        if self.done:
+            return
+
+        self._line += chunk
+        *lines, rest = self._line.split(b"\n")
+        self._line = bytearray(rest)
+
+        for line in lines:
+            if len(line) > MAX_LINE_LENGTH:
+                self.done = True
+                break
+
+            self._feed_line(bytes(line).strip())
+
+            if self.done:
+                break
+
+        if len(self._line) > MAX_LINE_LENGTH:
+            self.done = True
+
+        if self.done:
+            self._line.clear()
+            self._block.clear()
+
+    def _feed_line(self, line: bytes) -> None:
+        if self._header is None:
+            if (match := BEGIN.match(line)) is not None:
+                fmt = (match.group(1) or b"PNG").decode().upper()
+                self._header = (fmt, int(match.group(2)), int(match.group(3)))
+                self._block.clear()
+            elif line != b"" and not line.startswith(b";"):
+                self.done = True
+            return
+
+        if END.match(line) is not None:
+            self._end_block()
+        elif len(self._block) + len(line) > MAX_THUMBNAIL_SIZE:
+            self.done = True
+        else:
+            self._block += line.lstrip(b";").strip()
+
+    def _end_block(self) -> None:
+        assert self._header is not None
+        fmt, width, height = self._header
+        self._header = None
+
+        if fmt not in FORMATS:
+            return
+
+        try:
+            data = base64.b64decode(self._block, validate=True)
+        except binascii.Error:
+            return
+        finally:
+            self._block.clear()
+
+        thumbnail = Thumbnail(fmt, width, height, data)
+
+        if self.best is None or thumbnail.rank() > self.best.rank():
+            self.best = thumbnail
+
+
+def preview_path(gcode_path: str | Path) -> Path | None:
+    """
+    Get the preview image saved next to a gcode file.
+    :param gcode_path: path of the gcode file
+    :return: path of the image or None if the file has no preview
+    """
+    gcode_path = Path(gcode_path)
+
+    for suffix, _ in FORMATS.values():
+        path = gcode_path.with_suffix(".preview" + suffix)
+        if path.exists():
+            return path
+
+    return None
+
+
+def preview_media_type(path: Path) -> str:
+    return next(
+        media_type for suffix, media_type in FORMATS.values() if suffix == path.suffix
+    )
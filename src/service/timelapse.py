@@ -0,0 +1,129 @@
+import os
+import struct
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import aiofiles
+import httpx
+from typing_extensions import override
+
+from setting import app_settings
+from task import PeriodicTask
+from .camera import camera_hub
+
+# (offset, length) of a frame in the segment file
+INDEX_ENTRY = struct.Struct("<QI")
+
+
+class Timelapse:
+    def __init__(self, job_id: int, path: Path | None = None) -> None:
+        """
+        JPEG frames of a job appended to a segment file, with a fixed-size index entry per frame,
+        so any frame is read with one seek and the number of frames is known from the index size.
+        :param job_id: job id
+        :param path: directory of timelapse files, defaults to `upload_path/timelapse`
+        """
+        path = path or app_settings.upload_path / "timelapse"
+        self.segment_path: Path = path / f"{job_id}.mjpeg"
+        self.index_path: Path = path / f"{job_id}.idx"
+
+    def exists(self) -> bool:
+        return self.index_path.exists()
+
+    def frame_count(self) -> int:
+        if not self.exists():
+            return 0
+
+        # a partial entry of an interrupted append is ignored
+        return self.index_path.stat().st_size // INDEX_ENTRY.size
+
+    async def append(self, frame: bytes) -> int:
+        """
+        Append a frame, the frame is written before its index entry,
+        so the index never refers to an incomplete frame.
+        :param frame: JPEG bytes
+        :return: number of the frame
+        """
+        self.segment_path.parent.mkdir(parents=True, exist_ok=True)
+
+        async with aiofiles.open(self.segment_path, "ab") as f:
+            offset = os.fstat(f.fileno()).st_size
+            await f.write(frame)
+
+        count = self.frame_count()
+
+        async with aiofiles.open(self.index_path, "ab") as f:
+            await f.truncate(count * INDEX_ENTRY.size)
+            await f.write(INDEX_ENTRY.pack(offset, len(frame)))
+
+        return count
+
+    async def frame(self, n: int) -> bytes:
+        """
+        Read a frame.
+        :param n: number of the frame, starts from 0
+        :return: JPEG bytes
+        """
+        if not 0 <= n < self.frame_count():
+            raise IndexError(f"frame {n} is out of range")
+
+        async with aiofiles.open(self.index_path, "rb") as f:
+            await f.seek(n * INDEX_ENTRY.size)
+            offset, length = INDEX_ENTRY.unpack(await f.read(INDEX_ENTRY.size))
+
+        async with aiofiles.open(self.segment_path, "rb") as f:
+            await f.seek(offset)
+            return await f.read(length)
+
+    async def frames(self, start: int = 0) -> AsyncIterator[bytes]:
+        """
+        Read frames in order, one frame is held in memory at a time.
+        :param start: number of the first frame
+        :return: JPEG frames
+        """
+        count = self.frame_count()
+
+        if start >= count:
+            return
+
+        async with (
+            aiofiles.open(self.index_path, "rb") as index,
+            aiofiles.open(self.segment_path, "rb") as segment,
+        ):
+            await index.seek(max(start, 0) * INDEX_ENTRY.size)
+
+            for _ in range(max(start, 0), count):
+                offset, length = INDEX_ENTRY.unpack(await index.read(INDEX_ENTRY.size))
+                await segment.seek(offset)
+                yield await segment.read(length)
+
+
+class TimelapseRecorder(PeriodicTask):
+    def __init__(
+        self, job_id: int, camera_url: str, interval_secs: float | None = None
+    ) -> None:
+        """
+        Appends a camera snapshot to the timelapse of a job every interval.
+
+        Snapshots come from the camera hub, so a watched camera is not requested again.
+        :param job_id: job id
+        :param camera_url: url of the camera
+        :param interval_secs: seconds between two frames, defaults to TIMELAPSE_INTERVAL
+        """
+        super().__init__(
+            interval_secs or app_settings.timelapse_interval,
+            name=f"TimelapseRecorder{job_id}",
+        )
+        self.job_id: int = job_id
+        self.camera_url: str = camera_url
+        self.timelapse: Timelapse = Timelapse(job_id)
+
+    @override
+    async def step(self) -> None:
+        try:
+            frame = await camera_hub.snapshot(self.camera_url)
+        except httpx.HTTPError as e:
+            self.logger.warning("cannot get camera snapshot, error type=%s", type(e))
+            return
+
+        await self.timelapse.append(frame)
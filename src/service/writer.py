@@ -0,0 +1,245 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+from sqlalchemy import bindparam, update
+
+from db import DatabaseSession
+from db.models import Job, JobHistory, JobStatus
+from setting import app_settings
+from .db import BaseDbService
+
+
+class _PendingWrite:
+    def __init__(self, future: asyncio.Future[None]) -> None:
+        self.flags: int = 0
+        self.history: list[str] = []
+        self.future: asyncio.Future[None] = future
+
+
+class JobWriter(BaseDbService):
+    def __init__(
+        self,
+        db: DatabaseSession | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+    ) -> None:
+        """
+        Write-behind writer of job status flags and job history records.
+
+        Status flags added to the same job are coalesced,
+        buffered writes are committed in one transaction when the buffer is full
+        or every flush interval.
+        :param db: a database session, the writer will use a new session if is None
+        :param batch_size: max number of buffered writes before a flush
+        :param flush_interval: max seconds a write is buffered
+        """
+        super().__init__(db)
+        self.batch_size: int = batch_size or app_settings.write_behind_batch_size
+        self.flush_interval: float = (
+            flush_interval or app_settings.write_behind_interval
+        )
+        self.logger: logging.Logger = logging.getLogger("JobWriter")
+
+        self._pending: dict[int, _PendingWrite] = {}
+        self._flushing: dict[int, _PendingWrite] = {}
+        self._size: int = 0
+        self._lock = asyncio.Lock()
+        self._flush_now = asyncio.Event()
+
+        self.__stop: bool = False
+        self.__task: asyncio.Task[None] | None = None
+
+    @property
+    def closed(self) -> bool:
+        return self.__stop
+
+    def submit(self, job_id: int, flag: JobStatus) -> asyncio.Future[None]:
+        """
+        Buffer a status flag of a job and a history record of it.
+        :param job_id: job id
+        :param flag: status flag added to the job
+        :return: a future resolved once the write is committed
+        """
+        if self.__stop:
+            raise RuntimeError("JobWriter is closed")
+
+        write = self._pending.get(job_id)
+
+        if write is None:
+            future = asyncio.get_running_loop().create_future()
+            write = self._pending[job_id] = _PendingWrite(future)
+
+        write.flags |= flag.value
+        write.history.append(str(flag))
+        self._size += 1
+
+        if self._size >= self.batch_size:
+            self._flush_now.set()
+
+        return write.future
+
+    async def wait(self, job_id: int) -> None:
+        """
+        Flush buffered writes now and wait until all buffered writes of a job are committed.
+        :param job_id: job id
+        """
+        futures = [
+            writes[job_id].future
+            for writes in (self._flushing, self._pending)
+            if job_id in writes
+        ]
+
+        if job_id in self._pending:
+            self._flush_now.set()
+
+        await asyncio.gather(*(asyncio.shield(future) for future in futures))
+
+    async def flush(self) -> None:
+        """
+        Commit all buffered writes in one transaction,
+        writes are kept in the buffer and retried in next flush if the transaction fails.
+        """
+        async with self._lock:
+            if len(self._pending) == 0:
+                return
+
+            batch = self._flushing = self._pending
+            self._pending, self._size = {}, 0
+
+            try:
+                await self._write(batch)
+            except Exception:
+                self.logger.exception(
+                    "failed to write %d jobs, retry in next flush", len(batch)
+                )
+                await self.db.rollback()
+                self._requeue(batch)
+                return
+            finally:
+                self._flushing = {}
+
+            for write in batch.values():
+                write.future.set_result(None)
+
+            self.logger.debug("wrote %d jobs", len(batch))
+
+    async def _write(self, batch: dict[int, _PendingWrite]) -> None:
+        table = Job.__table__  # type: ignore[attr-defined]
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("job_id"))
+            .values(status=table.c.status.bitwise_or(bindparam("flags")))
+        )
+        params = [
+            {"job_id": job_id, "flags": write.flags} for job_id, write in batch.items()
+        ]
+
+        await self.db.exec(stmt, params=params)  # type: ignore[call-overload]
+        self.db.add_all(
+            JobHistory(job_id=job_id, status=status)
+            for job_id, write in batch.items()
+            for status in write.history
+        )
+        await self.db.commit()
+
+    def _requeue(self, batch: dict[int, _PendingWrite]) -> None:
+        for job_id, failed in batch.items():
+            newer = self._pending.get(job_id)
+
+            if newer is not None:
+                failed.flags |= newer.flags
+                failed.history += newer.history
+                # callers waiting for the newer write are notified by the same flush
+                failed.future.add_done_callback(self._notify(newer.future))
+
+            self._pending[job_id] = failed
+
+        self._size = sum(len(write.history) for write in self._pending.values())
+
+    @staticmethod
+    def _notify(
+        future: asyncio.Future[None],
+    ) -> Callable[[asyncio.Future[None]], None]:
+        def notify(done: asyncio.Future[None]) -> None:
+            if (e := done.exception()) is not None:
+                future.set_exception(e)
+            else:
+                future.set_result(None)
+
+        return notify
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        self.logger.info("started")
+
+        while not self.__stop:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except TimeoutError:
+                pass
+
+            self._flush_now.clear()
+            await self.flush()
+
+        self.logger.info("stopped")
+
+    async def close(self) -> None:
+        """
+        Stop the writer and commit all buffered writes,
+        futures of writes that still fail to commit are set with a RuntimeError.
+        """
+        self.__stop = True
+        self._flush_now.set()
+
+        if self.__task is not None:
+            await self.__task
+            self.__task = None
+
+        await self.flush()
+
+        if len(self._pending) > 0:
+            self.logger.error("%d jobs are not written", len(self._pending))
+            self._fail_pending()
+
+        await self.__aexit__(None, None, None)
+
+    def _fail_pending(self) -> None:
+        for job_id, write in self._pending.items():
+            write.future.set_exception(
+                RuntimeError(f"JobWriter is closed before job {job_id} is written")
+            )
+            # the exception is raised to waiters, avoid warnings if nobody waits
+            write.future.exception()
+
+        self._pending, self._size = {}, 0
+
+
+job_writer: JobWriter | None = None
+
+
+def get_job_writer() -> JobWriter | None:
+    """
+    Get the write-behind job writer, it is started on first use.
+    :return: the job writer or None if write-behind is disabled
+    """
+    global job_writer
+
+    if not app_settings.write_behind:
+        return None
+
+    if job_writer is None:
+        job_writer = JobWriter()
+        job_writer.start()
+
+    return job_writer
+
+
+async def close_job_writer() -> None:
+    global job_writer
+
+    if job_writer is not None:
+        await job_writer.close()
+        job_writer = None
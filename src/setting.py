@@ -6,6 +6,7 @@ from pydantic import (
     AnyUrl,
     DirectoryPath,
     NewPath,
+    NonNegativeFloat,
     PositiveFloat,
     PositiveInt,
     UrlConstraints,
@@ -23,14 +24,45 @@ class LoggingLevel(StrEnum):
     CRITICAL = "CRITICAL"
 
 
+class PrinterWorkerMode(StrEnum):
+    Task = "task"
+    Poller = "poller"
+    Fleet = "fleet"
+
+
 class AppSettings(BaseSettings):
     database_url: AnyUrl = AnyUrl("sqlite+aiosqlite://")
     opcua_server_url: OpcuaUrl = OpcuaUrl("opc.tcp://mock-server:4840")
     opcua_server_namespace: str = "http://monashautomation.com/opcua-server"
+    opcua_heartbeat_interval: PositiveFloat = 60
+    opcua_batch_commit: bool = False
+    opcua_commit_interval: PositiveFloat = 1
+    opcua_reconnect_min_delay: PositiveFloat = 1
+    opcua_reconnect_max_delay: PositiveFloat = 60
+    opcua_buffer_size: PositiveInt = 10000
     upload_path: NewPath | DirectoryPath = Path("./upload")
     printer_worker_interval: PositiveFloat = 5
+    printer_worker_idle_interval: PositiveFloat = 15
+    printer_worker_finishing_interval: PositiveFloat = 1
+    printer_worker_finishing_progress: PositiveFloat = 95
+    printer_worker_offline_interval: PositiveFloat = 30
+    printer_worker_phase_spread: NonNegativeFloat = 5
+    printer_worker_jitter: NonNegativeFloat = 0.2
+    printer_worker_mode: PrinterWorkerMode = PrinterWorkerMode.Task
+    printer_worker_concurrency: PositiveInt = 32
+    task_lateness_warning: PositiveFloat = 1
     order_fetcher_interval: PositiveFloat = 5
     auto_schedule: bool = True
+    write_behind: bool = False
+    write_behind_batch_size: PositiveInt = 100
+    write_behind_interval: PositiveFloat = 1
+    status_event_queue_size: PositiveInt = 16
+    status_event_keepalive: PositiveFloat = 15
+    status_change_log_size: PositiveInt = 1000
+    camera_max_frame_size: PositiveInt = 4 * 1024 * 1024
+    camera_snapshot_ttl: NonNegativeFloat = 2
+    timelapse_enabled: bool = False
+    timelapse_interval: PositiveFloat = 10
     mock_printer_interval: PositiveFloat = 2
     mock_printer_job_time: PositiveInt = 30
     mock_printer_target_bed_temperature: PositiveInt = 100
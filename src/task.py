@@ -1,14 +1,47 @@
 import asyncio
+import heapq
+import itertools
 import logging
-from typing import Self
+import math
+import random
+from collections.abc import Awaitable, Callable
+from typing import Generic, Self, TypeVar
+
+from setting import app_settings
+
+T = TypeVar("T")
 
 
 class PeriodicTask:
-    def __init__(self, interval_secs: float, name: str | None = None):
+    def __init__(
+        self,
+        interval_secs: float,
+        name: str | None = None,
+        phase_secs: float = 0,
+        jitter_secs: float = 0,
+    ):
+        """
+        A task that runs step() periodically.
+
+        Steps are scheduled on deadlines, so the time spent in a step is not added to the period.
+        :param interval_secs: seconds between two steps
+        :param name: name of the task logger
+        :param phase_secs: seconds to wait before the first step, used to spread tasks started together
+        :param jitter_secs: each step is delayed by a random offset in [-jitter_secs, jitter_secs]
+        """
         self.interval_secs: float = interval_secs
+        self.phase_secs: float = phase_secs
+        self.jitter_secs: float = jitter_secs
         self.name: str = name or type(self).__name__
         self.logger: logging.Logger = logging.getLogger(self.name)
+
+        self.ticks: int = 0
+        self.missed_ticks: int = 0
+        self.tick_lateness: float = 0
+        self.max_tick_lateness: float = 0
+
         self.__stop: bool = False
+        self.__stepping: bool = False
         self.__task: asyncio.Task[None] | None = None
 
     def start(self) -> None:
@@ -18,19 +51,271 @@ class PeriodicTask:
         self.__stop = True
         self.__task = None
 
+    async def close(self) -> None:
+        """
+        Stop the task and wait until it is stopped,
+        a running step is finished while a wait for the next step is cancelled.
+        """
+        task = self.__task
+        self.stop()
+
+        if task is None:
+            return
+
+        if not self.__stepping:
+            task.cancel()
+
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
     async def run(self) -> None:
         self.logger.info("started")
+        loop = asyncio.get_running_loop()
+
         async with self:
+            await asyncio.sleep(self.phase_secs)
+            deadline = wakeup = loop.time()
+
             while not self.__stop:
-                await self.step()
-                await asyncio.sleep(self.interval_secs)
+                self.record_lateness(loop.time() - wakeup)
+
+                self.__stepping = True
+                try:
+                    await self.step()
+                finally:
+                    self.__stepping = False
+
+                if self.__stop:
+                    break
+
+                deadline = self.next_deadline(deadline, loop.time())
+                wakeup = deadline + self.jitter()
+                await asyncio.sleep(max(wakeup - loop.time(), 0))
         self.logger.info("stopped")
 
     async def step(self) -> None:
         pass
 
+    def next_interval(self) -> float:
+        """
+        Seconds to wait before the next step, subclasses may adapt it to their states.
+        :return: interval in seconds
+        """
+        return self.interval_secs
+
+    def next_deadline(self, deadline: float, now: float) -> float:
+        """
+        Get the deadline of the next step, ticks that have passed during a long step are skipped.
+        :param deadline: deadline of the current step
+        :param now: current time
+        :return: deadline of the next step
+        """
+        interval = self.next_interval()
+        deadline += interval
+
+        if now > deadline:
+            missed = math.ceil((now - deadline) / interval)
+            self.missed_ticks += missed
+            deadline += missed * interval
+            self.logger.warning(
+                "step overran, missed %d ticks (%d in total)", missed, self.missed_ticks
+            )
+
+        return deadline
+
+    def jitter(self) -> float:
+        if self.jitter_secs <= 0:
+            return 0
+        return random.uniform(-self.jitter_secs, self.jitter_secs)
+
+    def record_lateness(self, lateness: float) -> None:
+        """
+        Record how late a step is started after its scheduled time,
+        a warning is logged if it is later than TASK_LATENESS_WARNING seconds.
+        :param lateness: lateness in seconds
+        """
+        self.ticks += 1
+        self.tick_lateness = lateness
+        self.max_tick_lateness = max(self.max_tick_lateness, lateness)
+
+        if lateness > app_settings.task_lateness_warning:
+            self.logger.warning(
+                "step started %.3fs late (max %.3fs)", lateness, self.max_tick_lateness
+            )
+
     async def __aenter__(self) -> Self:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
         return
+
+
+class PollScheduler:
+    def __init__(self, max_concurrency: int, name: str | None = None):
+        """
+        Runs steps of many periodic tasks from a single asyncio task.
+
+        Tasks are kept in a heap ordered by their next wakeup time,
+        due steps are dispatched with at most max_concurrency steps running at the same time.
+        :param max_concurrency: max number of steps running concurrently
+        :param name: name of the scheduler logger
+        """
+        self.name: str = name or type(self).__name__
+        self.logger: logging.Logger = logging.getLogger(self.name)
+
+        # (wakeup time, insertion order, deadline, task)
+        self._heap: list[tuple[float, int, float, PeriodicTask]] = []
+        self._order = itertools.count()
+        self._tasks: set[PeriodicTask] = set()
+        self._removed: bool = False
+        self._steps: set[asyncio.Task[None]] = set()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+
+        self.__stop: bool = False
+        self.__task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        self.__stop = True
+        self.__task = None
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """
+        Stop the scheduler and wait until running steps are finished and all tasks are closed.
+        """
+        task = self.__task
+        self.stop()
+
+        if task is not None:
+            await task
+
+    async def add(self, task: PeriodicTask) -> None:
+        """
+        Schedule a task, its first step runs after its phase.
+        :param task: a periodic task that is not started by itself
+        """
+        await task.__aenter__()
+        self._tasks.add(task)
+
+        deadline = asyncio.get_running_loop().time() + task.phase_secs
+        self._push(deadline, task)
+
+    def remove(self, task: PeriodicTask) -> None:
+        """
+        Stop scheduling a task, the task is closed once its running step (if any) finishes.
+        :param task: a scheduled task
+        """
+        if task not in self._tasks:
+            return
+
+        self._tasks.remove(task)
+        self._removed = True
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        self.logger.info("started")
+        loop = asyncio.get_running_loop()
+
+        while not self.__stop:
+            self._wakeup.clear()
+
+            if self._removed:
+                await self._drop_removed()
+
+            if len(self._heap) == 0:
+                await self._wakeup.wait()
+                continue
+
+            wakeup, _, deadline, task = self._heap[0]
+            delay = wakeup - loop.time()
+
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            await self._semaphore.acquire()
+            task.record_lateness(loop.time() - wakeup)
+
+            step = asyncio.create_task(self._step(task, deadline))
+            self._steps.add(step)
+            step.add_done_callback(self._steps.discard)
+
+        await asyncio.gather(*self._steps)
+        for task in self._tasks:
+            await task.__aexit__(None, None, None)
+        self.logger.info("stopped")
+
+    def _push(self, deadline: float, task: PeriodicTask) -> None:
+        wakeup = deadline + task.jitter()
+        heapq.heappush(self._heap, (wakeup, next(self._order), deadline, task))
+        self._wakeup.set()
+
+    async def _step(self, task: PeriodicTask, deadline: float) -> None:
+        try:
+            await task.step()
+        except Exception:
+            self.logger.exception("%s failed to run a step", task.name)
+        finally:
+            self._semaphore.release()
+
+        if task in self._tasks:
+            now = asyncio.get_running_loop().time()
+            self._push(task.next_deadline(deadline, now), task)
+        else:
+            await task.__aexit__(None, None, None)
+
+    async def _drop_removed(self) -> None:
+        removed = [item[3] for item in self._heap if item[3] not in self._tasks]
+        self._heap = [item for item in self._heap if item[3] in self._tasks]
+        heapq.heapify(self._heap)
+        self._removed = False
+
+        for task in removed:
+            await task.__aexit__(None, None, None)
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self) -> None:
+        """
+        Coalesces concurrent calls of a coroutine function,
+        calls made while a call is in flight share its result instead of starting a new call.
+        """
+        self._flight: asyncio.Task[T] | None = None
+
+    @property
+    def in_flight(self) -> bool:
+        return self._flight is not None
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call fn, or wait for the result of the call in flight.
+
+        A cancelled caller doesn't cancel the call shared by other callers.
+        :param fn: a coroutine function
+        :return: result of the call
+        """
+        if self._flight is None:
+            self._flight = asyncio.ensure_future(fn())
+            self._flight.add_done_callback(self._land)
+
+        return await asyncio.shield(self._flight)
+
+    def _land(self, flight: asyncio.Task[T]) -> None:
+        self._flight = None
+
+        # the exception is raised to callers, avoid warnings if all callers are cancelled
+        if not flight.cancelled():
+            flight.exception()
@@ -1,3 +1,13 @@
-__all__ = ["PrinterWorker", "LatestPrinterStatus"]
+__all__ = [
+    "PrinterWorker",
+    "LatestPrinterStatus",
+    "StatusBroadcaster",
+    "status_events",
+    "StatusChanges",
+    "StatusChangeLog",
+    "status_changes",
+]
 
 from .core import LatestPrinterStatus, PrinterWorker
+from .events import StatusBroadcaster, status_events
+from .changes import StatusChanges, StatusChangeLog, status_changes
@@ -0,0 +1,139 @@
+from collections import deque
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from pydantic import BaseModel
+
+from setting import app_settings
+
+if TYPE_CHECKING:
+    from .core import LatestPrinterStatus
+
+StatusFields = dict[str, Any]
+
+
+class StatusChange(NamedTuple):
+    seq: int
+    printer_id: int
+    # changed fields, None if the printer became unreachable
+    fields: StatusFields | None
+    # the worker of the printer is stopped
+    removed: bool = False
+
+
+class StatusChanges(BaseModel):
+    seq: int
+    full: bool
+    printers: dict[int, StatusFields | None]
+    # printers removed after `since`, only set if `full` is False
+    removed: list[int] = []
+
+
+class StatusChangeLog:
+    def __init__(self, max_size: int | None = None) -> None:
+        """
+        A bounded log of field-level changes of printer statuses.
+
+        Each recorded status that differs from the previous status of the printer
+        is given a global sequence number, clients read changes after the last sequence number they saw.
+        :param max_size: max number of changes kept in the log
+        """
+        self.seq: int = 0
+        self._log: deque[StatusChange] = deque(
+            maxlen=max_size or app_settings.status_change_log_size
+        )
+        self._latest: dict[int, StatusFields | None] = {}
+        # recorded statuses, compared before encoding a status
+        self._statuses: dict[int, "LatestPrinterStatus | None"] = {}
+        # sequence number of the last change of each printer
+        self._printer_seq: dict[int, int] = {}
+
+    def record(self, printer_id: int, status: "LatestPrinterStatus | None") -> int:
+        """
+        Record a status of a printer if it has changed.
+
+        The status is compared with the previous status before it is encoded,
+        so recorded statuses should not be modified.
+        :param printer_id: printer id
+        :param status: latest status or None if the printer is unreachable
+        :return: sequence number of the last change of the printer
+        """
+        if printer_id in self._statuses and self._statuses[printer_id] == status:
+            return self._printer_seq[printer_id]
+
+        self._statuses[printer_id] = status
+        fields = None if status is None else status.model_dump(mode="json")
+        prev = self._latest.get(printer_id)
+
+        if printer_id in self._latest and fields == prev:
+            return self._printer_seq[printer_id]
+
+        if fields is None or prev is None:
+            changed = fields
+        else:
+            changed = {k: v for k, v in fields.items() if prev.get(k) != v}
+
+        self._latest[printer_id] = fields
+        self.seq += 1
+        self._printer_seq[printer_id] = self.seq
+        self._log.append(StatusChange(self.seq, printer_id, changed))
+
+        return self.seq
+
+    def forget(self, printer_id: int) -> int:
+        """
+        Remove a printer, e.g. after its worker is stopped.
+        The removal is recorded as a change, so clients after it drop the printer.
+        :param printer_id: printer id
+        :return: sequence number of the removal
+        """
+        self._latest.pop(printer_id, None)
+        self._statuses.pop(printer_id, None)
+        self._printer_seq.pop(printer_id, None)
+        self.seq += 1
+        self._log.append(StatusChange(self.seq, printer_id, None, removed=True))
+
+        return self.seq
+
+    def changes_since(self, since: int) -> StatusChanges:
+        """
+        Get changed fields of each printer after a sequence number.
+
+        All fields of all printers are returned if changes after `since` are no longer in the log.
+        :param since: last sequence number seen by the client, 0 to get all fields
+        :return: merged changes and the latest sequence number
+        """
+        oldest = self._log[0].seq if len(self._log) > 0 else self.seq + 1
+
+        if since < oldest - 1 or since > self.seq:
+            return StatusChanges(seq=self.seq, full=True, printers=dict(self._latest))
+
+        printers: dict[int, StatusFields | None] = {}
+        removed: set[int] = set()
+
+        for change in self._log:
+            if change.seq <= since:
+                continue
+
+            merged = printers.get(change.printer_id)
+
+            if change.removed:
+                printers.pop(change.printer_id, None)
+                removed.add(change.printer_id)
+                continue
+
+            # a printer added again is recorded with all fields
+            removed.discard(change.printer_id)
+
+            if change.fields is None:
+                printers[change.printer_id] = None
+            elif merged is None:
+                printers[change.printer_id] = dict(change.fields)
+            else:
+                merged.update(change.fields)
+
+        return StatusChanges(
+            seq=self.seq, full=False, printers=printers, removed=sorted(removed)
+        )
+
+
+status_changes: StatusChangeLog = StatusChangeLog()
@@ -1,4 +1,6 @@
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
+from typing import Any
 
 import httpx
 from mes_opcua_server.models import Printer as OpcuaPrinter
@@ -8,9 +10,11 @@ from typing_extensions import override
 from db.models import Job, JobStatus, Printer
 from printer import ActualPrinter
 from printer.models import PrinterStatus, LatestJob
-from service import JobService, opcua_service
+from service import JobService, TimelapseRecorder, get_job_writer, opcua_service
 from setting import app_settings
-from task import PeriodicTask
+from task import PeriodicTask, SingleFlight
+from .changes import status_changes
+from .events import status_events
 
 
 class LatestPrinterStatus(PrinterStatus):
@@ -45,29 +49,74 @@ class PrinterWorker(PeriodicTask):
             self,
             interval_secs=app_settings.printer_worker_interval,
             name=f"PrinterWorker{printer.id}",
+            phase_secs=random.uniform(0, app_settings.printer_worker_phase_spread),
+            jitter_secs=app_settings.printer_worker_jitter,
         )
 
-        self.job_service: JobService = job_service or JobService()
+        self.job_service: JobService = job_service or JobService(
+            cache_active_jobs=True, writer=get_job_writer()
+        )
 
+        assert printer.id is not None
         self.printer: Printer = printer
+        self.printer_id: int = printer.id
         self.api: ActualPrinter = api
         self.opcua_printer: OpcuaPrinter | None = opcua_printer
 
+        # fields of statuses that never change, validated once
+        self._printer_fields: dict[str, Any] = {
+            "name": printer.opcua_name or "",
+            "model": printer.model or str(printer.api),
+            "url": HttpUrl(printer.url),
+            "camera_url": printer.camera_url,
+        }
+        # values of the OPC UA printer written by the last commit
+        self._opcua_values: dict[str, Any] = {}
+        self._opcua_update_time: datetime = datetime.min
+        # generation of the OPC UA service when the values were written
+        self._opcua_generation: int = opcua_service.generation
+        self._opcua_camera_url: HttpUrl = HttpUrl(
+            printer.camera_url or "http://unknown"
+        )
+
         self._cache_update_time: datetime = datetime.min
         self._status_cache: LatestPrinterStatus | None = None
+        self._status_flight: SingleFlight[LatestPrinterStatus | None] = SingleFlight()
+        # JSON of the cached status, encoded once for all API responses
+        self._status_json: tuple[LatestPrinterStatus | None, bytes] = (None, b"null")
+        # sequence number of the cached status in the status change log
+        self.status_seq: int = 0
+        self.timelapse: TimelapseRecorder | None = None
 
     @override
     async def step(self) -> None:
-        try:
-            stat = await self.printer_status()
+        stat = await self.poll()
+
+        if stat is None:
+            return
 
-            if stat is None:
-                return
+        job = await self.job_service.current_printer_job(self.printer_id)
+        await self.reconcile(job, stat)
 
-            if self.opcua_printer is not None:
-                await self._update_opcua(stat)
+    async def poll(self) -> LatestPrinterStatus | None:
+        """
+        Fetch the latest printer status and publish it to the OPC UA server.
+        :return: latest status or None if the printer is unreachable
+        """
+        stat = await self.printer_status(max_age=0)
 
-            job = await self.job_service.current_printer_job(self.printer.id)
+        if stat is not None and self.opcua_printer is not None:
+            await self._update_opcua(stat)
+
+        return stat
+
+    async def reconcile(self, job: Job | None, stat: LatestPrinterStatus) -> None:
+        """
+        Handle the printer status, errors of printer API calls are logged.
+        :param job: current job of the printer in the database
+        :param stat: latest printer status
+        """
+        try:
             await self.handle_status(job, stat)
         except httpx.HTTPStatusError as e:
             self.logger.error(
@@ -80,6 +129,45 @@ class PrinterWorker(PeriodicTask):
                 "http request failed, url=%s, error type=%s", e.request.url, type(e)
             )
 
+        self.update_timelapse(job, stat)
+
+    def update_timelapse(self, job: Job | None, stat: LatestPrinterStatus) -> None:
+        """
+        Record a timelapse while the current job is printing,
+        the recorder is stopped once the job leaves the printing state.
+        :param job: current job of the printer
+        :param stat: latest printer status
+        """
+        recording = (
+            app_settings.timelapse_enabled
+            and self.printer.camera_url is not None
+            and job is not None
+            and job.id is not None
+            and job.is_printing()
+            and stat.is_printing
+        )
+
+        if self.timelapse is not None and (
+            not recording or job is None or self.timelapse.job_id != job.id
+        ):
+            self.stop_timelapse()
+
+        if recording and self.timelapse is None:
+            assert job is not None and job.id is not None
+            assert self.printer.camera_url is not None
+
+            self.logger.info("start recording timelapse (id=%d)", job.id)
+            self.timelapse = TimelapseRecorder(job.id, self.printer.camera_url)
+            self.timelapse.start()
+
+    def stop_timelapse(self) -> None:
+        if self.timelapse is None:
+            return
+
+        self.logger.info("stop recording timelapse (id=%d)", self.timelapse.job_id)
+        self.timelapse.stop()
+        self.timelapse = None
+
     async def handle_status(self, job: Job | None, stat: LatestPrinterStatus) -> None:
         if stat.is_error:
             self.logger.error("printer has an error, try again in next iteration")
@@ -116,7 +204,7 @@ class PrinterWorker(PeriodicTask):
         assert stat.is_printing and stat.job is not None
 
         job = Job(
-            printer_id=self.printer.id,
+            printer_id=self.printer_id,
             from_server=False,
             status=(JobStatus.Printing | JobStatus.Scheduled).value,
             printer_filename=stat.job.file_path,
@@ -168,52 +256,169 @@ class PrinterWorker(PeriodicTask):
         self.logger.warning("simulate sending pickup request to robots")
         await self.job_service.update_job(job, JobStatus.PickupIssued)
 
-    async def printer_status(self) -> LatestPrinterStatus | None:
+    @override
+    def next_interval(self) -> float:
+        """
+        Poll idle printers slowly, printing printers normally and
+        printers that are about to finish a job quickly.
+        :return: seconds until the next step
+        """
+        stat = self._status_cache
+
+        if stat is None:
+            return app_settings.printer_worker_offline_interval
+        elif stat.is_ready:
+            return app_settings.printer_worker_idle_interval
+        elif (
+            stat.is_printing
+            and stat.job_progress_or_zero()
+            >= app_settings.printer_worker_finishing_progress
+        ):
+            return app_settings.printer_worker_finishing_interval
+        else:
+            return self.interval_secs
+
+    @property
+    def cached_status(self) -> LatestPrinterStatus | None:
+        """
+        Status of the last poll, the printer is never called.
+        :return: latest status or None if the printer is unreachable or not polled yet
+        """
+        return self._status_cache
+
+    @property
+    def cached_status_json(self) -> bytes:
+        """
+        JSON of the status of the last poll, it is encoded once after each poll.
+        :return: JSON bytes, `null` if the printer is unreachable or not polled yet
+        """
+        stat, data = self._status_json
+
+        if stat is not self._status_cache:
+            stat = self._status_cache
+            data = b"null" if stat is None else stat.model_dump_json().encode()
+            self._status_json = (stat, data)
+
+        return data
+
+    async def printer_status(
+        self, max_age: float | None = None
+    ) -> LatestPrinterStatus | None:
+        """
+        Get the latest printer status, the printer is called only if the cached status is stale.
+
+        Concurrent callers of a stale status share one printer request.
+        :param max_age: max age of the cached status in seconds, defaults to the interval
+            until the next poll of the printer, see next_interval()
+        :return: latest status or None if the printer is unreachable
+        """
+        if max_age is None:
+            max_age = self.next_interval()
+
         delta = datetime.now() - self._cache_update_time
-        if delta.seconds < self.interval_secs:
+        if delta.total_seconds() < max_age:
             return self._status_cache
 
+        return await self._status_flight.run(self._fetch_status)
+
+    async def _fetch_status(self) -> LatestPrinterStatus | None:
         try:
             stat = await self.api.current_status()
         except httpx.HTTPError as e:
             self.logger.error("cannot get printer status, error type=%s", type(e))
             self._status_cache = None
+            self.status_seq = status_changes.record(self.printer_id, None)
+            status_events.publish(self.printer, None)
             return None
 
         self._cache_update_time = datetime.now()
-        self._status_cache = LatestPrinterStatus(
-            **stat.model_dump(),
-            name=self.printer.opcua_name or "",
-            model=self.printer.model or str(self.printer.api),
-            url=HttpUrl(self.printer.url),
-            camera_url=self.printer.camera_url,
-        )
+        latest = self.latest_status(stat)
+
+        # keep an unchanged status, so its JSON is not encoded again
+        if latest != self._status_cache:
+            self._status_cache = latest
+
+        self.status_seq = status_changes.record(self.printer_id, self._status_cache)
+
+        if len(status_events) > 0:
+            status_events.publish(
+                self.printer, self._status_cache, self.cached_status_json
+            )
 
         return self._status_cache
 
-    async def _update_opcua(self, stat: LatestPrinterStatus) -> None:
-        assert self.opcua_printer is not None
+    def latest_status(self, stat: PrinterStatus) -> LatestPrinterStatus:
+        """
+        Add printer fields to a status without validating it again.
+        :param stat: a validated status returned by the printer API
+        :return: latest status of the printer
+        """
+        return LatestPrinterStatus.model_construct(**dict(stat), **self._printer_fields)
 
+    def _opcua_printer_values(self, stat: LatestPrinterStatus) -> dict[str, Any]:
         bed, nozzle, job = stat.temp_bed, stat.temp_nozzle, stat.job
 
-        self.opcua_printer.url = stat.url
-        self.opcua_printer.update_time = datetime.now()
-        self.opcua_printer.state = stat.state
-        self.opcua_printer.bed.target = bed.target
-        self.opcua_printer.bed.actual = bed.actual
-        self.opcua_printer.nozzle.target = nozzle.target
-        self.opcua_printer.nozzle.actual = nozzle.actual
-        self.opcua_printer.camera_url = HttpUrl(stat.camera_url or "http://unknown")
-        self.opcua_printer.model = stat.model
+        values = {
+            "url": stat.url,
+            "state": stat.state,
+            "bed.target": bed.target,
+            "bed.actual": bed.actual,
+            "nozzle.target": nozzle.target,
+            "nozzle.actual": nozzle.actual,
+            "camera_url": self._opcua_camera_url,
+            "model": stat.model,
+        }
 
         if job is not None:
-            self.opcua_printer.job.file = job.file_path
-            self.opcua_printer.job.progress = job.progress or 0
-            self.opcua_printer.job.time_used = job.time_used or 0
-            self.opcua_printer.job.time_left = job.time_left or 0
-            self.opcua_printer.job.time_left_approx = job.time_approx or 0
+            values |= {
+                "job.file": job.file_path,
+                "job.progress": job.progress or 0,
+                "job.time_used": job.time_used or 0,
+                "job.time_left": job.time_left or 0,
+                "job.time_left_approx": job.time_approx or 0,
+            }
+
+        return values
+
+    async def _update_opcua(self, stat: LatestPrinterStatus) -> None:
+        """
+        Write fields of the OPC UA printer that changed since the last commit.
+        If nothing changed, only the update time is written every heartbeat interval.
+        All fields are written again after the OPC UA service goes offline or reconnects.
+        :param stat: latest printer status
+        """
+        assert self.opcua_printer is not None
+
+        if self._opcua_generation != opcua_service.generation:
+            # the server may have lost written values, write the full state again
+            self._opcua_values.clear()
+            self._opcua_generation = opcua_service.generation
+
+        values = self._opcua_printer_values(stat)
+        changes = {
+            path: value
+            for path, value in values.items()
+            if path not in self._opcua_values or self._opcua_values[path] != value
+        }
+
+        now = datetime.now()
+        heartbeat = timedelta(seconds=app_settings.opcua_heartbeat_interval)
 
+        if len(changes) == 0 and now - self._opcua_update_time < heartbeat:
+            return
+
+        changes["update_time"] = now
+        generation = opcua_service.generation
+        opcua_service.update(self.opcua_printer, changes)
         await opcua_service.commit()
 
+        if opcua_service.generation != generation:
+            # the commit failed, the full state is written after reconnecting
+            return
+
+        self._opcua_values |= values
+        self._opcua_update_time = now
+
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop_timelapse()
         await self.job_service.__aexit__(exc_type, exc_val, exc_tb)
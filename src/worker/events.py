@@ -0,0 +1,141 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, NamedTuple
+
+from db.models import Printer
+from setting import app_settings
+
+if TYPE_CHECKING:
+    from .core import LatestPrinterStatus
+
+
+class StatusEvent(NamedTuple):
+    printer_id: int
+    status: "LatestPrinterStatus | None"
+    # JSON of the status, encoded once for all subscribers
+    status_json: str
+
+    def to_json(self) -> str:
+        return f'{{"printer_id":{self.printer_id},"status":{self.status_json}}}'
+
+
+class StatusSubscriber:
+    def __init__(
+        self,
+        printer_id: int | None = None,
+        group_name: str | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        """
+        A bounded queue of status events of one printer, a printer group or all printers.
+
+        The oldest event is dropped if the queue is full, so a slow subscriber never blocks publishers.
+        :param printer_id: only receive events of the printer if not None
+        :param group_name: only receive events of printers in the group if not None
+        :param max_size: max number of queued events
+        """
+        self.printer_id: int | None = printer_id
+        self.group_name: str | None = group_name
+        self.dropped: int = 0
+        self._queue: asyncio.Queue[StatusEvent] = asyncio.Queue(
+            max_size or app_settings.status_event_queue_size
+        )
+
+    def matches(self, printer: Printer) -> bool:
+        return (self.printer_id is None or self.printer_id == printer.id) and (
+            self.group_name is None or self.group_name == printer.group_name
+        )
+
+    def put(self, event: StatusEvent) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+
+        self._queue.put_nowait(event)
+
+    async def get(self) -> StatusEvent:
+        return await self._queue.get()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class StatusBroadcaster:
+    """
+    Fans out statuses published by printer workers to subscribers.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: set[StatusSubscriber] = set()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(
+        self, printer_id: int | None = None, group_name: str | None = None
+    ) -> StatusSubscriber:
+        subscriber = StatusSubscriber(printer_id=printer_id, group_name=group_name)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StatusSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(
+        self,
+        printer: Printer,
+        status: "LatestPrinterStatus | None",
+        status_json: bytes | None = None,
+    ) -> None:
+        """
+        Publish a status of a printer to matching subscribers without waiting.
+        :param printer: the printer
+        :param status: latest status or None if the printer is unreachable
+        :param status_json: JSON of the status if it is already encoded
+        """
+        assert printer.id is not None
+
+        if len(self._subscribers) == 0:
+            return
+
+        if status_json is None:
+            status_json = (
+                b"null" if status is None else status.model_dump_json().encode()
+            )
+
+        event = StatusEvent(printer.id, status, status_json.decode())
+
+        for subscriber in self._subscribers:
+            if subscriber.matches(printer):
+                subscriber.put(event)
+
+    async def stream(
+        self,
+        printer_id: int | None = None,
+        group_name: str | None = None,
+        keepalive_secs: float | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Subscribe to statuses as Server-Sent Events, the subscriber is removed when the stream is closed.
+        :param printer_id: only stream statuses of the printer if not None
+        :param group_name: only stream statuses of printers in the group if not None
+        :param keepalive_secs: send a comment if no event is sent in `keepalive_secs` seconds
+        :return: SSE messages
+        """
+        keepalive_secs = keepalive_secs or app_settings.status_event_keepalive
+        subscriber = self.subscribe(printer_id=printer_id, group_name=group_name)
+
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), keepalive_secs)
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                yield f"event: status\ndata: {event.to_json()}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+status_events: StatusBroadcaster = StatusBroadcaster()
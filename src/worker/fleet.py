@@ -0,0 +1,92 @@
+import asyncio
+
+from sqlalchemy.exc import SQLAlchemyError
+from typing_extensions import override
+
+from service import JobService, get_job_writer
+from setting import app_settings
+from task import PeriodicTask
+from .core import LatestPrinterStatus, PrinterWorker
+
+
+class FleetReconciler(PeriodicTask):
+    def __init__(self, job_service: JobService | None = None) -> None:
+        """
+        Runs printer workers of the whole fleet in ticks.
+
+        Each tick polls all printers concurrently, loads current jobs of all printers in one query
+        and commits all job changes in one transaction.
+        Workers handle their statuses concurrently, job changes are written after all workers
+        have handled their statuses, so the transaction is not held open by printer requests.
+        Failures of a printer are logged without stopping other printers.
+        Workers should be created with the job service of the reconciler.
+        :param job_service: job service shared by all workers
+        """
+        PeriodicTask.__init__(
+            self,
+            interval_secs=app_settings.printer_worker_interval,
+            name="FleetReconciler",
+            jitter_secs=app_settings.printer_worker_jitter,
+        )
+        self.job_service: JobService = job_service or JobService(
+            cache_active_jobs=True, writer=get_job_writer()
+        )
+        self.workers: dict[int, PrinterWorker] = {}
+
+    def add(self, worker: PrinterWorker) -> None:
+        self.workers[worker.printer_id] = worker
+
+    def remove(self, printer_id: int) -> None:
+        worker = self.workers.pop(printer_id, None)
+
+        if worker is not None:
+            worker.stop_timelapse()
+
+    @override
+    async def step(self) -> None:
+        workers = list(self.workers.values())
+        stats = await asyncio.gather(
+            *(worker.poll() for worker in workers), return_exceptions=True
+        )
+        polled: list[tuple[PrinterWorker, LatestPrinterStatus]] = []
+
+        for worker, stat in zip(workers, stats):
+            if isinstance(stat, Exception):
+                # other printers are still monitored
+                worker.logger.error("failed to poll printer", exc_info=stat)
+            elif isinstance(stat, BaseException):
+                raise stat
+            elif stat is not None:
+                polled.append((worker, stat))
+
+        if len(polled) == 0:
+            return
+
+        try:
+            jobs = await self.job_service.current_printer_jobs(
+                [worker.printer_id for worker, _ in polled]
+            )
+
+            # job changes are written on exit, so printers are handled concurrently
+            async with self.job_service.batch():
+                results = await asyncio.gather(
+                    *(
+                        worker.reconcile(jobs.get(worker.printer_id), stat)
+                        for worker, stat in polled
+                    ),
+                    return_exceptions=True,
+                )
+
+                for (worker, _), result in zip(polled, results):
+                    if isinstance(result, Exception):
+                        # keep changes of other printers in this tick
+                        worker.logger.error(
+                            "failed to handle printer status", exc_info=result
+                        )
+                    elif isinstance(result, BaseException):
+                        raise result
+        except SQLAlchemyError:
+            self.logger.exception("failed to update jobs, retry in next tick")
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.job_service.__aexit__(exc_type, exc_val, exc_tb)
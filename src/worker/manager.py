@@ -1,9 +1,14 @@
+import asyncio
 import logging
 
 from db.models import Printer
 from printer import create_printer
-from service import opcua_service
+from service import JobService, opcua_service
+from setting import PrinterWorkerMode, app_settings
+from task import PollScheduler
+from .changes import status_changes
 from .core import PrinterWorker, LatestPrinterStatus
+from .fleet import FleetReconciler
 
 PrinterId = int
 
@@ -11,15 +16,53 @@ printer_workers: dict[PrinterId, PrinterWorker] = {}
 
 _logger = logging.getLogger("worker.manager")
 
+_poller: PollScheduler | None = None
+_reconciler: FleetReconciler | None = None
 
-async def create_printer_worker(printer: Printer) -> PrinterWorker:
+
+def get_poller() -> PollScheduler:
+    """
+    Get the scheduler that runs all printer workers in poller mode, it is started on first use.
+    :return: the printer poller
+    """
+    global _poller
+
+    if _poller is None:
+        _poller = PollScheduler(
+            max_concurrency=app_settings.printer_worker_concurrency,
+            name="PrinterPoller",
+        )
+        _poller.start()
+
+    return _poller
+
+
+def get_reconciler() -> FleetReconciler:
+    """
+    Get the reconciler that runs all printer workers in fleet mode, it is started on first use.
+    :return: the fleet reconciler
+    """
+    global _reconciler
+
+    if _reconciler is None:
+        _reconciler = FleetReconciler()
+        _reconciler.start()
+
+    return _reconciler
+
+
+async def create_printer_worker(
+    printer: Printer, job_service: JobService | None = None
+) -> PrinterWorker:
     api = create_printer(api=printer.api, url=printer.url, api_key=printer.api_key)
 
     opcua = None
     if printer.opcua_name is not None:
         opcua = await opcua_service.get_printer(printer.opcua_name)
 
-    return PrinterWorker(printer=printer, opcua_printer=opcua, api=api)
+    return PrinterWorker(
+        printer=printer, opcua_printer=opcua, api=api, job_service=job_service
+    )
 
 
 def get_printer_worker(printer_id: int) -> PrinterWorker | None:
@@ -35,13 +78,58 @@ async def get_printer_status(printer_id: int) -> LatestPrinterStatus | None:
     return await worker.printer_status()
 
 
+def get_printer_statuses(
+    group_name: str | None = None,
+) -> dict[PrinterId, LatestPrinterStatus | None]:
+    """
+    Get cached statuses of all printers that have a worker, printers are not called.
+    :param group_name: only include printers of the group if not None
+    :return: a dict mapping printer id to its latest status, None if the printer is unreachable
+    """
+    return {
+        printer_id: worker.cached_status
+        for printer_id, worker in printer_workers.items()
+        if group_name is None or worker.printer.group_name == group_name
+    }
+
+
+def get_printer_statuses_json(group_name: str | None = None) -> bytes:
+    """
+    Same as get_printer_statuses, but statuses are pre-encoded JSON.
+    :param group_name: only include printers of the group if not None
+    :return: JSON of a dict mapping printer id to its latest status
+    """
+    items = b",".join(
+        b'"%d":%s' % (printer_id, worker.cached_status_json)
+        for printer_id, worker in printer_workers.items()
+        if group_name is None or worker.printer.group_name == group_name
+    )
+    return b"{" + items + b"}"
+
+
 async def start_new_printer_worker(printer: Printer) -> None:
+    assert printer.id is not None
+
     if printer.id in printer_workers:
         return
 
-    worker = await create_printer_worker(printer)
-    printer_workers[printer.id] = worker
-    worker.start()
+    # the printer is listed in statuses before its first poll
+    status_changes.record(printer.id, None)
+
+    match app_settings.printer_worker_mode:
+        case PrinterWorkerMode.Fleet:
+            reconciler = get_reconciler()
+            worker = await create_printer_worker(printer, reconciler.job_service)
+            printer_workers[printer.id] = worker
+            reconciler.add(worker)
+        case PrinterWorkerMode.Poller:
+            worker = await create_printer_worker(printer)
+            printer_workers[printer.id] = worker
+            await get_poller().add(worker)
+        case _:
+            worker = await create_printer_worker(printer)
+            printer_workers[printer.id] = worker
+            worker.start()
 
 
 def stop_printer_worker(printer_id: int) -> None:
@@ -49,4 +137,36 @@ def stop_printer_worker(printer_id: int) -> None:
         return
 
     worker = printer_workers.pop(printer_id)
-    worker.stop()
+    status_changes.forget(printer_id)
+
+    match app_settings.printer_worker_mode:
+        case PrinterWorkerMode.Fleet:
+            get_reconciler().remove(printer_id)
+        case PrinterWorkerMode.Poller:
+            get_poller().remove(worker)
+        case _:
+            worker.stop()
+
+
+async def stop_all_printer_workers() -> None:
+    """
+    Stop all printer workers and wait until their running steps are finished,
+    so no job is updated after it returns.
+    """
+    global _poller, _reconciler
+
+    workers = list(printer_workers.values())
+    printer_workers.clear()
+
+    if _reconciler is not None:
+        await _reconciler.close()
+        _reconciler = None
+
+        for worker in workers:
+            worker.stop_timelapse()
+
+    if _poller is not None:
+        await _poller.close()
+        _poller = None
+
+    await asyncio.gather(*(worker.close() for worker in workers))
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+from http import HTTPStatus
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.etag import make_etag
+from app.routers import printers
+from db.models import Printer
+from printer import PrinterApi
+from printer.models import PrinterState, PrinterStatus, Temperature
+from service import PrinterService, printer_version
+from tests.worker.dummy_printer import DummyPrinter
+from worker import PrinterWorker, LatestPrinterStatus, manager
+
+
+@pytest.fixture
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(printers.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def worker(mock_printer: Printer):
+    worker = PrinterWorker(printer=mock_printer, api=DummyPrinter(mock_printer.url))
+    worker._status_cache = LatestPrinterStatus(
+        state=PrinterState.Ready,
+        name=mock_printer.opcua_name,
+        url=mock_printer.url,
+        camera_url=mock_printer.camera_url,
+        model=mock_printer.model,
+        temp_bed=Temperature(actual=0, target=0),
+        temp_nozzle=Temperature(actual=0, target=0),
+    )
+    worker.status_seq = 3
+    manager.printer_workers[mock_printer.id] = worker
+    yield worker
+    manager.printer_workers.clear()
+
+
+def test_etags_of_different_versions_do_not_match():
+    assert make_etag("status", 1, 3) == make_etag("status", 1, 3)
+    assert make_etag("status", 1, 3) != make_etag("status", 1, 4)
+
+
+def test_status_not_modified(client: TestClient, worker: PrinterWorker):
+    # keep the cached status fresh
+    worker._cache_update_time = datetime.max
+
+    resp = client.get(f"/printers/{worker.printer.id}/status")
+    assert resp.status_code == HTTPStatus.OK
+    etag = resp.headers["ETag"]
+
+    resp = client.get(
+        f"/printers/{worker.printer.id}/status", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == HTTPStatus.NOT_MODIFIED
+    assert resp.content == b""
+
+    worker.status_seq = 4
+    resp = client.get(
+        f"/printers/{worker.printer.id}/status", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["ETag"] != etag
+
+
+def test_fleet_status_is_pre_encoded(client: TestClient, worker: PrinterWorker):
+    resp = client.get("/printers/status")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {
+        str(worker.printer.id): worker.cached_status.model_dump(mode="json")
+    }
+
+
+def test_fleet_status_changes_when_worker_is_stopped(
+    client: TestClient, worker: PrinterWorker
+):
+    etag = client.get("/printers/status").headers["ETag"]
+
+    manager.stop_printer_worker(worker.printer.id)
+    resp = client.get("/printers/status", headers={"If-None-Match": etag})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {}
+
+
+def test_status_etag_ignores_changes_of_other_printers(
+    client: TestClient, worker: PrinterWorker
+):
+    other = PrinterWorker(
+        printer=Printer(id=2, url="http://mock.printer2:5000", api=PrinterApi.Mock),
+        api=DummyPrinter("http://mock.printer2:5000"),
+    )
+    manager.printer_workers[2] = other
+    status = worker.cached_status
+
+    async def poll(target: PrinterWorker, state: PrinterState) -> None:
+        async def current_status() -> PrinterStatus:
+            return PrinterStatus.model_validate(status.model_dump() | {"state": state})
+
+        target.api.current_status = current_status
+        await target.printer_status(max_age=0)
+
+    asyncio.run(poll(worker, PrinterState.Ready))
+    asyncio.run(poll(other, PrinterState.Ready))
+    etag = client.get(f"/printers/{worker.printer.id}/status").headers["ETag"]
+
+    for state in (PrinterState.Printing, PrinterState.Ready, PrinterState.Printing):
+        asyncio.run(poll(other, state))
+        asyncio.run(poll(worker, PrinterState.Ready))
+
+    resp = client.get(
+        f"/printers/{worker.printer.id}/status", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_unknown_printer_is_not_found_with_matching_etag(
+    client: TestClient, monkeypatch
+):
+    async def get_printer(self, **kwargs) -> None:
+        return None
+
+    monkeypatch.setattr(PrinterService, "get_printer", get_printer)
+    etag = make_etag("printer", 100, printer_version.value)
+
+    resp = client.get("/printers/100", headers={"If-None-Match": etag})
+    assert resp.status_code == HTTPStatus.NOT_FOUND
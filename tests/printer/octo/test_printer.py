@@ -0,0 +1,64 @@
+import json
+from pathlib import Path
+
+import httpx
+import pytest
+from pytest import raises
+
+from printer.models import PrinterState
+from printer.octo.core import OctoPrinter
+
+EXAMPLES = Path(__file__).parents[3] / "examples" / "octo-rest-api"
+
+
+def octo_client(job_status_code: int = 200, printer_status_code: int = 200):
+    printer_state = (EXAMPLES / "resp_state_ready.json").read_text()
+    job_state = (EXAMPLES / "resp_get_job.json").read_text()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        match request.url.path:
+            case "/api/printer":
+                return httpx.Response(printer_status_code, text=printer_state)
+            case "/api/job":
+                return httpx.Response(job_status_code, text=job_state)
+            case _:
+                return httpx.Response(404)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def octo_printer() -> OctoPrinter:
+    return OctoPrinter(url="http://octo.printer:5000", api_key="key")
+
+
+async def test_current_status(octo_printer):
+    octo_printer.client = octo_client()
+
+    stat = await octo_printer.current_status()
+
+    assert stat.state == PrinterState.Ready
+    assert (
+        stat.temp_nozzle.actual
+        == json.loads((EXAMPLES / "resp_state_ready.json").read_text())["temperature"][
+            "tool0"
+        ]["actual"]
+    )
+    assert stat.job is not None
+    assert stat.job.file_path == "b.gcode"
+
+
+async def test_job_request_failed(octo_printer):
+    octo_printer.client = octo_client(job_status_code=500)
+
+    stat = await octo_printer.current_status()
+
+    assert stat.state == PrinterState.Error
+    assert stat.job is None
+
+
+async def test_printer_request_failed(octo_printer):
+    octo_printer.client = octo_client(printer_status_code=409)
+
+    with raises(httpx.HTTPStatusError):
+        await octo_printer.current_status()
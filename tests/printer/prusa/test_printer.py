@@ -0,0 +1,105 @@
+from collections import Counter
+
+import httpx
+import pytest
+
+from printer.models import PrinterState
+from printer.prusa.core import PrusaPrinter
+
+
+class FakePrusaLink:
+    def __init__(self) -> None:
+        self.job_id: int = 1
+        self.progress: float = 10
+        self.requests: Counter[str] = Counter()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests[request.url.path] += 1
+
+        match request.url.path:
+            case "/api/v1/status":
+                return httpx.Response(
+                    200,
+                    json={
+                        "job": {
+                            "id": self.job_id,
+                            "progress": self.progress,
+                            "time_remaining": 100,
+                            "time_printing": 50,
+                        },
+                        "printer": {
+                            "state": "PRINTING",
+                            "temp_nozzle": 200,
+                            "target_nozzle": 200,
+                            "temp_bed": 60,
+                            "target_bed": 60,
+                            "axis_z": 1.5,
+                        },
+                    },
+                )
+            case "/api/v1/job":
+                return httpx.Response(
+                    200,
+                    json={
+                        "id": self.job_id,
+                        "state": "PRINTING",
+                        "progress": 0,
+                        "time_printing": 0,
+                        "time_remaining": 0,
+                        "file": {
+                            "name": f"JOB{self.job_id}~1.GCO",
+                            "display_name": f"job{self.job_id}.gcode",
+                            "path": "/usb",
+                            "refs": {
+                                "icon": f"/thumb/s/usb/JOB{self.job_id}~1.GCO",
+                                "thumbnail": f"/thumb/l/usb/JOB{self.job_id}~1.GCO",
+                                "download": f"/usb/JOB{self.job_id}~1.GCO",
+                            },
+                        },
+                    },
+                )
+            case _:
+                return httpx.Response(404)
+
+
+@pytest.fixture
+def prusa_link() -> FakePrusaLink:
+    return FakePrusaLink()
+
+
+@pytest.fixture
+def prusa_printer(prusa_link: FakePrusaLink) -> PrusaPrinter:
+    printer = PrusaPrinter(url="http://prusa.printer", api_key="key")
+    printer.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(prusa_link.handler)
+    )
+    return printer
+
+
+async def test_current_status(prusa_printer, prusa_link):
+    stat = await prusa_printer.current_status()
+
+    assert stat.state == PrinterState.Printing
+    assert stat.job is not None
+    assert stat.job.id == 1
+    assert stat.job.file_path == "job1.gcode"
+    assert stat.job.previewed_model_url == "/thumb/l/usb/JOB1~1.GCO"
+    assert stat.job.progress == 10
+    assert stat.job.time_used == 50
+    assert stat.job.time_left == 100
+
+
+async def test_job_details_fetched_once_per_job(prusa_printer, prusa_link):
+    for progress in (10, 20, 30):
+        prusa_link.progress = progress
+        stat = await prusa_printer.current_status()
+        assert stat.job.progress == progress
+
+    assert prusa_link.requests["/api/v1/status"] == 3
+    assert prusa_link.requests["/api/v1/job"] == 1
+
+    prusa_link.job_id = 2
+    stat = await prusa_printer.current_status()
+
+    assert stat.job.file_path == "job2.gcode"
+    assert prusa_link.requests["/api/v1/job"] == 2
@@ -0,0 +1,189 @@
+import asyncio
+
+import httpx
+import pytest
+
+from service.camera import CameraHub, FrameSubscriber, MjpegParser, multipart_frame
+
+UPSTREAM_BOUNDARY = "boundarydonotcross"
+
+
+def upstream_part(frame: bytes, content_length: bool = True) -> bytes:
+    headers = b"Content-Type: image/jpeg\r\n"
+    if content_length:
+        headers += b"Content-Length: %d\r\n" % len(frame)
+    return b"--%s\r\n%s\r\n%s\r\n" % (UPSTREAM_BOUNDARY.encode(), headers, frame)
+
+
+class FakeCamera:
+    def __init__(self, frames: int = 1000, fps: float = 100) -> None:
+        self.frames = frames
+        self.fps = fps
+        self.connections = 0
+        self.open_connections = 0
+        self.snapshots = 0
+
+    async def stream(self):
+        self.connections += 1
+        self.open_connections += 1
+        try:
+            for i in range(self.frames):
+                yield upstream_part(b"\xff\xd8frame%d\xff\xd9" % i)
+                await asyncio.sleep(1 / self.fps)
+        finally:
+            self.open_connections -= 1
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.url.params["action"] == "snapshot":
+            self.snapshots += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, content=b"snapshot%d" % self.snapshots)
+
+        return httpx.Response(
+            200,
+            headers={
+                "Content-Type": f"multipart/x-mixed-replace;boundary={UPSTREAM_BOUNDARY}"
+            },
+            content=self.stream(),
+        )
+
+
+@pytest.fixture
+def camera() -> FakeCamera:
+    return FakeCamera()
+
+
+@pytest.fixture
+def hub(camera: FakeCamera) -> CameraHub:
+    return CameraHub(httpx.AsyncClient(transport=httpx.MockTransport(camera.handler)))
+
+
+def test_parse_boundary():
+    assert MjpegParser.boundary("multipart/x-mixed-replace;boundary=abc") == "abc"
+    assert MjpegParser.boundary('multipart/x-mixed-replace; boundary="abc"') == "abc"
+    assert MjpegParser.boundary("image/jpeg") is None
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+def test_parse_frames_split_across_chunks(content_length: bool):
+    parser = MjpegParser(UPSTREAM_BOUNDARY)
+    frames = [b"\xff\xd8one\xff\xd9", b"\xff\xd8two\r\n\xff\xd9"]
+    stream = b"".join(upstream_part(f, content_length) for f in frames)
+    # the last frame is completed by the next boundary if there is no length
+    stream += b"--" + UPSTREAM_BOUNDARY.encode()
+
+    parsed = []
+    for i in range(0, len(stream), 7):
+        parsed += parser.feed(stream[i : i + 7])
+
+    assert parsed == frames
+
+
+def test_parser_discards_oversized_frames():
+    parser = MjpegParser(UPSTREAM_BOUNDARY, max_frame_size=64)
+
+    assert parser.feed(upstream_part(b"x" * 100)[:-20]) == []
+    assert parser.feed(upstream_part(b"small")) == [b"small"]
+
+
+def test_parser_discards_oversized_frames_without_length():
+    parser = MjpegParser(UPSTREAM_BOUNDARY, max_frame_size=128)
+    stream = upstream_part(b"x" * 200, content_length=False)
+    stream += upstream_part(b"small", content_length=False)
+    stream += b"--" + UPSTREAM_BOUNDARY.encode()
+
+    parsed = []
+    for i in range(0, len(stream), 16):
+        parsed += parser.feed(stream[i : i + 16])
+
+    assert parsed == [b"small"]
+
+
+def test_slow_subscriber_keeps_latest_frame():
+    subscriber = FrameSubscriber()
+
+    for frame in (b"1", b"2", b"3"):
+        subscriber.put(frame)
+
+    assert subscriber.dropped == 2
+    assert subscriber._queue.get_nowait() == b"3"
+
+
+async def test_viewers_share_one_upstream(hub: CameraHub, camera: FakeCamera):
+    url = "http://camera.local"
+    viewers = [hub.stream(url) for _ in range(10)]
+
+    parts = await asyncio.gather(*(anext(viewer) for viewer in viewers))
+
+    assert camera.connections == 1
+    assert all(
+        part.startswith(b"--frame\r\nContent-Type: image/jpeg") for part in parts
+    )
+
+    for viewer in viewers:
+        await viewer.aclose()
+    await asyncio.sleep(0.05)
+
+    assert not hub.feed(url).is_open
+    assert camera.open_connections == 0
+
+
+async def test_viewers_end_with_upstream(camera: FakeCamera, hub: CameraHub):
+    camera.frames = 2
+    parts = [part async for part in hub.stream("http://camera.local")]
+
+    assert 1 <= len(parts) <= 2
+    assert parts[-1] == multipart_frame(b"\xff\xd8frame1\xff\xd9")
+
+
+async def test_concurrent_snapshot_misses_share_one_request(
+    hub: CameraHub, camera: FakeCamera
+):
+    url = "http://camera.local"
+
+    snapshots = await asyncio.gather(*(hub.snapshot(url) for _ in range(20)))
+
+    assert camera.snapshots == 1
+    assert set(snapshots) == {b"snapshot1"}
+
+    # cached until the TTL expires
+    assert await hub.snapshot(url) == b"snapshot1"
+    assert camera.snapshots == 1
+
+    assert await hub.feed(url).snapshot(ttl=0) == b"snapshot2"
+
+
+async def test_snapshot_from_open_stream(hub: CameraHub, camera: FakeCamera):
+    url = "http://camera.local"
+    viewer = hub.stream(url)
+    await anext(viewer)
+
+    snapshot = await hub.snapshot(url)
+
+    assert snapshot.startswith(b"\xff\xd8frame")
+    assert camera.snapshots == 0
+    await viewer.aclose()
+
+
+async def test_stream_with_max_fps(hub: CameraHub, camera: FakeCamera):
+    url = "http://camera.local"
+    full, limited = hub.stream(url), hub.stream(url, fps=10)
+    counts = {"full": 0, "limited": 0}
+
+    async def watch(name: str, viewer) -> None:
+        async for _ in viewer:
+            counts[name] += 1
+
+    watchers = [
+        asyncio.create_task(watch("full", full)),
+        asyncio.create_task(watch("limited", limited)),
+    ]
+    await asyncio.sleep(0.3)
+    for watcher in watchers:
+        watcher.cancel()
+    await asyncio.gather(*watchers, return_exceptions=True)
+
+    # the camera sends 100 frames per second
+    assert counts["full"] > 15
+    assert counts["limited"] <= 4
+    assert hub.feed(url).subscribers == set()
@@ -1,8 +1,11 @@
 import pytest
 import pytest_asyncio
+from sqlalchemy import delete, event, text
 
+from db import DatabaseSession
 from db.models import Job, JobStatus
 from service import JobService
+from service.job import active_jobs
 
 
 @pytest.fixture
@@ -103,3 +106,240 @@ async def test_current_printer_job(job_service: JobService, printing_job: Job) -
 async def test_approve_job(job_service: JobService, new_job: Job) -> None:
     await job_service.update_job(new_job, JobStatus.Approved)
     assert new_job.flag() == JobStatus.Created | JobStatus.Approved
+
+
+async def test_current_printer_jobs(
+    job_service: JobService, scheduled_job: Job, printing_job: Job
+) -> None:
+    jobs = await job_service.current_printer_jobs(
+        [scheduled_job.printer_id, printing_job.printer_id, 100]
+    )
+
+    assert jobs.keys() == {scheduled_job.printer_id, printing_job.printer_id}
+    assert jobs[printing_job.printer_id].id == printing_job.id
+
+
+async def test_newest_of_active_jobs_is_current(
+    job_service: JobService, printing_job: Job, caplog
+) -> None:
+    newer_job = Job(
+        from_server=True,
+        printer_id=printing_job.printer_id,
+        status=printing_job.status,
+        original_filename="5.gcode",
+    )
+    await job_service.create_job(newer_job)
+
+    jobs = await job_service.current_printer_jobs([printing_job.printer_id])
+
+    assert jobs[printing_job.printer_id].id == newer_job.id
+    assert "more than one active job" in caplog.text
+
+
+async def test_batch_updates_commit_once(
+    job_service: JobService, scheduled_job: Job, printing_job: Job, monkeypatch
+) -> None:
+    commits = 0
+    commit = job_service.db.commit
+
+    async def count_commit() -> None:
+        nonlocal commits
+        commits += 1
+        await commit()
+
+    monkeypatch.setattr(job_service.db, "commit", count_commit)
+
+    async with job_service.batch():
+        await job_service.update_job(scheduled_job, JobStatus.Printing)
+        await job_service.update_job(printing_job, JobStatus.Printed)
+        assert commits == 0
+
+    assert commits == 1
+    assert len(await job_service.get_job_history(scheduled_job.id)) == 1
+    assert len(await job_service.get_job_history(printing_job.id)) == 1
+
+
+async def test_batch_executes_no_statements_in_context(
+    job_service: JobService, scheduled_job: Job, new_job: Job
+) -> None:
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args) -> None:
+        statements.append(statement)
+
+    engine = job_service.db.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+
+    try:
+        async with job_service.batch():
+            scheduled_job.printer_filename = "3.gcode"
+            await job_service.update_job(scheduled_job, JobStatus.Printing)
+            await job_service.create_job(
+                Job(
+                    from_server=False,
+                    printer_id=3,
+                    status=(JobStatus.Printing | JobStatus.Scheduled).value,
+                )
+            )
+            # printer requests of the batch would run here
+            assert statements == []
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    job = await job_service.get_job(job_id=scheduled_job.id)
+    assert job.is_printing() and job.printer_filename == "3.gcode"
+    assert await job_service.current_printer_job(3) is not None
+
+
+async def test_batch_keeps_changes_of_other_jobs(
+    job_service: JobService, scheduled_job: Job, printing_job: Job
+) -> None:
+    async with job_service.batch():
+        await job_service.update_job(scheduled_job, JobStatus.Printing)
+        await job_service.update_job(printing_job, JobStatus.Printed)
+
+        # deleted by another session during the batch
+        await job_service.db.exec(
+            delete(Job)
+            .where(Job.id == scheduled_job.id)
+            .execution_options(synchronize_session=False)
+        )
+
+    job = await job_service.get_job(job_id=printing_job.id)
+    assert job.is_printed()
+    assert len(await job_service.get_job_history(printing_job.id)) == 1
+    assert len(await job_service.get_job_history(scheduled_job.id)) == 0
+
+
+@pytest.fixture
+def caching_job_service(sqlite_session: DatabaseSession) -> JobService:
+    active_jobs.clear()
+    return JobService(db=sqlite_session, cache_active_jobs=True)
+
+
+async def test_current_job_is_cached(
+    caching_job_service: JobService, printing_job: Job, monkeypatch
+) -> None:
+    printer_id = printing_job.printer_id
+    job = await caching_job_service.current_printer_job(printer_id)
+    assert job.id == printing_job.id
+
+    async def no_query(*args, **kwargs):
+        raise AssertionError("current job should be read from cache")
+
+    monkeypatch.setattr(caching_job_service.db, "exec", no_query)
+
+    assert await caching_job_service.current_printer_job(printer_id) is job
+
+
+async def test_job_updates_write_through_cache(
+    caching_job_service: JobService, printing_job: Job
+) -> None:
+    printer_id = printing_job.printer_id
+    job = await caching_job_service.current_printer_job(printer_id)
+
+    await caching_job_service.update_job(job, JobStatus.Printed)
+    assert active_jobs.get(printer_id) is job
+
+    await caching_job_service.update_job(job, JobStatus.Picked)
+    assert printer_id not in active_jobs
+    assert await caching_job_service.current_printer_job(printer_id) is None
+    assert printer_id in active_jobs
+
+
+async def test_other_services_invalidate_cache(
+    caching_job_service: JobService, job_service: JobService, printing_job: Job
+) -> None:
+    printer_id = printing_job.printer_id
+    await caching_job_service.current_printer_job(printer_id)
+
+    job = await job_service.get_job(job_id=printing_job.id)
+    await job_service.update_job(job, JobStatus.CancelIssued)
+
+    assert printer_id not in active_jobs
+
+
+async def test_add_status_flag_keeps_concurrent_flags(
+    job_service: JobService, sqlite_session: DatabaseSession, printing_job: Job
+) -> None:
+    async with JobService(db=sqlite_session) as api_service:
+        status = await api_service.add_status_flag(
+            printing_job.id, JobStatus.CancelIssued
+        )
+    assert JobStatus.CancelIssued in JobStatus(status)
+
+    # printing_job was loaded before the job is cancelled
+    assert JobStatus.CancelIssued not in printing_job.flag()
+    await job_service.update_job(printing_job, JobStatus.Printed)
+
+    assert JobStatus.CancelIssued | JobStatus.Printed in printing_job.flag()
+    job = await job_service.get_job(job_id=printing_job.id)
+    assert JobStatus.CancelIssued | JobStatus.Printed in job.flag()
+
+
+async def test_add_status_flag_with_expected_status(
+    job_service: JobService, new_job: Job, scheduled_job: Job
+) -> None:
+    status = await job_service.add_status_flag(
+        new_job.id, JobStatus.Printing, expected=JobStatus.Scheduled
+    )
+    assert status is None
+    assert len(await job_service.get_job_history(new_job.id)) == 0
+
+    status = await job_service.add_status_flag(
+        scheduled_job.id, JobStatus.Printing, expected=JobStatus.Scheduled
+    )
+    assert status == (JobStatus.ToPrint | JobStatus.Printing).value
+    assert len(await job_service.get_job_history(scheduled_job.id)) == 1
+
+
+async def test_add_status_flag_with_excluded_status(
+    job_service: JobService, new_job: Job
+) -> None:
+    cancel = JobStatus.Cancelled | JobStatus.Picked
+
+    status = await job_service.add_status_flag(
+        new_job.id, JobStatus.CancelIssued, excluded=cancel
+    )
+    assert status == (JobStatus.Created | JobStatus.CancelIssued).value
+
+    await job_service.add_status_flag(new_job.id, JobStatus.Cancelled)
+    status = await job_service.add_status_flag(
+        new_job.id, JobStatus.CancelIssued, excluded=cancel
+    )
+    assert status is None
+
+
+async def test_add_status_flag_to_missing_job(job_service: JobService) -> None:
+    assert await job_service.add_status_flag(100, JobStatus.Approved) is None
+
+
+async def test_job_is_active(
+    job_service: JobService, approved_job: Job, printing_job: Job
+) -> None:
+    assert approved_job.is_active is False
+    assert printing_job.is_active is True
+
+    await job_service.update_job(printing_job, JobStatus.Picked)
+    assert printing_job.is_active is False
+
+    job = await job_service.get_job(job_id=printing_job.id)
+    assert job.is_active is False
+
+
+@pytest.mark.parametrize(
+    "where, index",
+    [
+        ("printer_id IN (1, 2) AND is_active = 1", "ix_job_printer_id_is_active"),
+        ("status = 7 AND printer_id = 1", "ix_job_status_printer_id"),
+    ],
+)
+async def test_job_queries_use_index(
+    sqlite_session: DatabaseSession, where: str, index: str
+) -> None:
+    result = await sqlite_session.exec(
+        text(f"EXPLAIN QUERY PLAN SELECT * FROM job WHERE {where}")
+    )
+    plan = " ".join(row[-1] for row in result.all())
+
+    assert f"USING INDEX {index}" in plan
@@ -0,0 +1,151 @@
+import pytest
+import pytest_asyncio
+
+from db import DatabaseSession
+from db.models import Job, JobStatus
+from service import JobService, JobWriter
+from service.job import active_jobs
+
+
+@pytest_asyncio.fixture
+async def job_writer(sqlite_session: DatabaseSession) -> JobWriter:
+    writer = JobWriter(db=sqlite_session, batch_size=10, flush_interval=60)
+    writer.start()
+    yield writer
+    await writer.close()
+
+
+@pytest_asyncio.fixture
+async def printing_job(job_service: JobService) -> Job:
+    job = Job(
+        from_server=True,
+        printer_id=1,
+        status=(
+            JobStatus.Created
+            | JobStatus.Approved
+            | JobStatus.Scheduled
+            | JobStatus.Printing
+        ).value,
+    )
+    await job_service.create_job(job)
+    return job
+
+
+async def stored_status(job_service: JobService, job: Job) -> JobStatus:
+    await job_service.db.refresh(job)
+    return job.flag()
+
+
+async def test_updates_are_buffered(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    service = JobService(db=job_service.db, writer=job_writer)
+
+    await service.update_job(printing_job, JobStatus.Printed)
+    await service.update_job(printing_job, JobStatus.PickupIssued)
+
+    assert JobStatus.PickupIssued in printing_job.flag()
+    assert JobStatus.Printed not in await stored_status(job_service, printing_job)
+
+    await job_writer.flush()
+
+    status = await stored_status(job_service, printing_job)
+    assert JobStatus.Printed | JobStatus.PickupIssued in status
+    assert len(await job_service.get_job_history(printing_job.id)) == 2
+
+
+async def test_wait_for_buffered_update(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    service = JobService(db=job_service.db, writer=job_writer)
+
+    await service.update_job(printing_job, JobStatus.Printed, wait=True)
+
+    assert JobStatus.Printed in await stored_status(job_service, printing_job)
+
+
+async def test_flush_on_batch_size(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    for _ in range(job_writer.batch_size):
+        job_writer.submit(printing_job.id, JobStatus.Printed)
+
+    await job_writer.wait(printing_job.id)
+
+    history = await job_service.get_job_history(printing_job.id)
+    assert len(history) == job_writer.batch_size
+
+
+async def test_flush_on_close(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    job_writer.submit(printing_job.id, JobStatus.Printed)
+    await job_writer.close()
+
+    assert JobStatus.Printed in await stored_status(job_service, printing_job)
+
+
+async def test_update_with_other_changes_is_committed(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    service = JobService(db=job_service.db, writer=job_writer)
+
+    printing_job.printer_filename = "A.gcode"
+    await service.update_job(printing_job, JobStatus.Printed)
+
+    assert JobStatus.Printed in await stored_status(job_service, printing_job)
+
+
+async def test_update_is_committed_after_writer_is_closed(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    service = JobService(db=job_service.db, writer=job_writer)
+    await job_writer.close()
+
+    with pytest.raises(RuntimeError):
+        job_writer.submit(printing_job.id, JobStatus.Printed)
+
+    await service.update_job(printing_job, JobStatus.Printed)
+    assert JobStatus.Printed in await stored_status(job_service, printing_job)
+
+
+async def test_invalidated_job_is_not_cached_again(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    active_jobs.clear()
+    service = JobService(db=job_service.db, cache_active_jobs=True, writer=job_writer)
+    job = await service.current_printer_job(printing_job.printer_id)
+
+    # cancelled through the API during a tick of the worker
+    active_jobs.invalidate(printing_job.printer_id)
+    await service.update_job(job, JobStatus.Printed)
+
+    assert printing_job.printer_id not in active_jobs
+
+
+async def test_buffered_update_is_read_after_cache_miss(
+    job_service: JobService, job_writer: JobWriter, printing_job: Job
+):
+    active_jobs.clear()
+    service = JobService(db=job_service.db, cache_active_jobs=True, writer=job_writer)
+    job = await service.current_printer_job(printing_job.printer_id)
+
+    await service.update_job(job, JobStatus.Printed)
+    active_jobs.invalidate(printing_job.printer_id)
+
+    job = await service.current_printer_job(printing_job.printer_id)
+    assert JobStatus.Printed in job.flag()
+
+
+async def test_unwritten_updates_fail_on_close(
+    job_writer: JobWriter, printing_job: Job, monkeypatch
+):
+    async def unavailable(batch):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(job_writer, "_write", unavailable)
+    future = job_writer.submit(printing_job.id, JobStatus.Printed)
+    await job_writer.close()
+
+    with pytest.raises(RuntimeError):
+        await future
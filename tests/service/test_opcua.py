@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+from service.opcua import OpcuaFlusher, OpcuaService
+from setting import app_settings
+
+
+class CountingClient:
+    def __init__(self) -> None:
+        self.update_tasks: asyncio.Queue = asyncio.Queue()
+        self.commits: int = 0
+        self.written: list = []
+        self.down: bool = False
+
+    async def commit(self) -> None:
+        if self.down:
+            raise ConnectionError("server is down")
+
+        self.commits += 1
+        while not self.update_tasks.empty():
+            self.written.append(self.update_tasks.get_nowait())
+
+    async def __aenter__(self) -> "CountingClient":
+        if self.down:
+            raise ConnectionError("server is down")
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        return
+
+
+class OpcuaObject:
+    """
+    Queues a write on every field update like objects of the OPC UA client.
+    """
+
+    def __init__(self, client: CountingClient, name: str) -> None:
+        object.__setattr__(self, "client", client)
+        object.__setattr__(self, "name", name)
+
+    def __setattr__(self, field: str, value: object) -> None:
+        self.client.update_tasks.put_nowait((self.name, field, value))
+
+
+@pytest.fixture
+def client() -> CountingClient:
+    return CountingClient()
+
+
+@pytest_asyncio.fixture
+async def service(client: CountingClient, monkeypatch) -> OpcuaService:
+    monkeypatch.setattr(app_settings, "opcua_reconnect_min_delay", 0.01)
+    monkeypatch.setattr(app_settings, "opcua_buffer_size", 3)
+
+    service = OpcuaService(batch_commit=False)
+    service._client = client
+    await service.connect()
+    yield service
+    await service.close()
+
+
+def test_update_nested_fields(service: OpcuaService):
+    printer = SimpleNamespace(bed=SimpleNamespace(actual=0), state="ready")
+
+    service.update(printer, {"bed.actual": 25.5, "state": "printing"})
+
+    assert printer.bed.actual == 25.5
+    assert printer.state == "printing"
+
+
+async def test_flusher_commits_queued_updates_once(
+    service: OpcuaService, client: CountingClient
+):
+    flusher = OpcuaFlusher(service, interval_secs=1)
+
+    for i in range(5):
+        service.update(OpcuaObject(client, f"Printer{i}"), {"state": "ready"})
+    await flusher.flush()
+
+    assert client.commits == 1
+    assert len(client.written) == 5
+    assert flusher.flushes == 1
+    assert flusher.queue_depth == flusher.max_queue_depth == 5
+    assert flusher.flush_latency >= 0
+
+
+async def test_flusher_skips_empty_queue(service: OpcuaService, client: CountingClient):
+    flusher = OpcuaFlusher(service, interval_secs=1)
+
+    await flusher.flush()
+
+    assert client.commits == 0
+    assert flusher.flushes == 0
+
+
+async def test_batch_commit_is_left_to_flusher(client: CountingClient):
+    service = OpcuaService(batch_commit=True)
+    service._client = client
+    await service.connect()
+
+    service.update(OpcuaObject(client, "Printer1"), {"state": "ready"})
+    await service.commit()
+    assert client.commits == 0
+
+    await service.close()
+    assert client.commits == 1
+
+
+async def test_reconnect_and_replay_latest_values(
+    service: OpcuaService, client: CountingClient
+):
+    printer1, printer2 = OpcuaObject(client, "P1"), OpcuaObject(client, "P2")
+    client.down = True
+
+    service.update(printer1, {"state": "printing"})
+    await service.commit()
+    assert not service.online
+    assert service.generation == 1
+
+    # only the latest value of each field is buffered
+    for progress in range(10):
+        service.update(printer2, {"progress": progress})
+    service.update(printer2, {"state": "ready"})
+    assert service.queue_depth == 1 + 2
+
+    # the buffer is bounded, the oldest field is dropped
+    service.update(printer1, {"model": "XL", "progress": 50})
+    assert service.queue_depth == 1 + 3
+    assert service.dropped_updates == 1
+
+    client.down = False
+    await asyncio.sleep(0.1)
+
+    assert service.online
+    assert service.generation == 2
+    assert service.queue_depth == 0
+    assert client.written == [
+        ("P1", "state", "printing"),
+        ("P2", "state", "ready"),
+        ("P1", "model", "XL"),
+        ("P1", "progress", 50),
+    ]
+
+
+async def test_close_waits_for_running_flush(client: CountingClient, monkeypatch):
+    monkeypatch.setattr(app_settings, "opcua_commit_interval", 0.01)
+    running, max_running = 0, 0
+    commit = client.commit
+
+    async def slow_commit() -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        await commit()
+        running -= 1
+
+    client.commit = slow_commit
+    service = OpcuaService(batch_commit=True)
+    service._client = client
+    await service.connect()
+
+    service.update(OpcuaObject(client, "Printer1"), {"state": "ready"})
+    await asyncio.sleep(0.02)
+    await service.close()
+
+    assert max_running == 1
+    assert client.written == [("Printer1", "state", "ready")]
@@ -0,0 +1,118 @@
+import base64
+from pathlib import Path
+
+from service import JobService
+from service.thumbnail import ThumbnailParser, preview_path
+from setting import app_settings
+
+
+def thumbnail_block(data: bytes, size: str, fmt: str | None = None) -> bytes:
+    encoded = base64.b64encode(data)
+    tag = "thumbnail" if fmt is None else f"thumbnail_{fmt}"
+    lines = [b"; %s begin %s %d" % (tag.encode(), size.encode(), len(encoded))]
+    lines += [b"; " + encoded[i : i + 78] for i in range(0, len(encoded), 78)]
+    lines += [b"; %s end" % tag.encode(), b";"]
+    return b"\n".join(lines) + b"\n"
+
+
+def gcode(*blocks: bytes) -> bytes:
+    header = b"; generated by PrusaSlicer\n;\n"
+    return header + b"".join(blocks) + b"G28\nG1 X10 Y10\n; thumbnail begin 1x1 4\n"
+
+
+def feed(content: bytes, chunk_size: int = 7) -> ThumbnailParser:
+    parser = ThumbnailParser()
+    for i in range(0, len(content), chunk_size):
+        parser.feed(content[i : i + chunk_size])
+    return parser
+
+
+def test_extract_png_thumbnail():
+    png = b"\x89PNG" + bytes(range(256)) * 2
+    parser = feed(gcode(thumbnail_block(png, "16x16")))
+
+    assert parser.best is not None
+    assert parser.best.format == "PNG"
+    assert (parser.best.width, parser.best.height) == (16, 16)
+    assert parser.best.data == png
+    assert parser.done
+
+
+def test_prefer_larger_browser_thumbnail():
+    small, large, qoi = b"small png", b"large png", b"qoif image"
+    parser = feed(
+        gcode(
+            thumbnail_block(small, "16x16"),
+            thumbnail_block(qoi, "600x600", "QOI"),
+            thumbnail_block(large, "300x300"),
+        )
+    )
+
+    assert parser.best is not None and parser.best.data == large
+
+
+def test_qoi_thumbnail_and_invalid_block():
+    qoi = b"qoif image"
+    parser = feed(
+        b"; thumbnail begin 300x300 10\n; !!not base64!!\n; thumbnail end\n"
+        + gcode(thumbnail_block(qoi, "300x300", "QOI"))
+    )
+
+    assert parser.best is not None
+    assert (parser.best.format, parser.best.data) == ("QOI", qoi)
+
+
+def test_no_thumbnail():
+    parser = feed(gcode())
+    assert parser.best is None
+
+
+async def test_save_gcode_file_with_preview(
+    job_service: JobService, tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(app_settings, "upload_path", tmp_path)
+    png = b"\x89PNG preview"
+    content = gcode(thumbnail_block(png, "16x16"))
+
+    async def chunks():
+        for i in range(0, len(content), 16):
+            yield content[i : i + 16]
+
+    path = await job_service.save_gcode_file("part.gcode", chunks())
+
+    assert path.read_bytes() == content
+    preview = preview_path(path)
+    assert preview is not None and preview.suffix == ".png"
+    assert preview.read_bytes() == png
+
+    path = await job_service.save_gcode_file("part.gcode", gcode())
+    assert preview_path(path) is None
+
+
+async def test_save_gcode_file_with_other_suffixes(
+    job_service: JobService, tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(app_settings, "upload_path", tmp_path)
+    content = gcode(thumbnail_block(b"\x89PNG preview", "16x16"))
+
+    for filename in ("part.gco", "part.GCODE"):
+        path = await job_service.save_gcode_file(filename, content)
+        assert preview_path(path) is not None
+
+    path = await job_service.save_gcode_file("part.bgcode", content)
+    assert preview_path(path) is None
+
+
+def test_parsing_stops_at_first_command_without_thumbnail():
+    parser = feed(b"; generated by Cura\nG28\n" + b"; comment\n" * 100)
+    assert parser.done and parser.best is None
+
+
+def test_parsing_stops_at_long_line():
+    parser = ThumbnailParser()
+
+    for _ in range(100):
+        parser.feed(b";" * 1024)
+
+    assert parser.done
+    assert len(parser._line) == 0
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from service import camera_hub
+from service.timelapse import INDEX_ENTRY, Timelapse, TimelapseRecorder
+
+
+@pytest.fixture
+def timelapse(tmp_path: Path) -> Timelapse:
+    return Timelapse(1, path=tmp_path)
+
+
+async def test_append_and_read_frames(timelapse: Timelapse):
+    assert not timelapse.exists()
+    assert timelapse.frame_count() == 0
+
+    for i in range(5):
+        assert await timelapse.append(b"frame%d" % i) == i
+
+    assert timelapse.frame_count() == 5
+    assert await timelapse.frame(3) == b"frame3"
+    assert [frame async for frame in timelapse.frames(2)] == [
+        b"frame2",
+        b"frame3",
+        b"frame4",
+    ]
+
+    with pytest.raises(IndexError):
+        await timelapse.frame(5)
+
+
+async def test_partial_index_entry_is_ignored(timelapse: Timelapse):
+    await timelapse.append(b"frame0")
+
+    # an append interrupted while writing the index
+    with open(timelapse.index_path, "ab") as f:
+        f.write(b"\x00" * (INDEX_ENTRY.size // 2))
+
+    assert timelapse.frame_count() == 1
+    assert await timelapse.append(b"frame1") == 1
+    assert await timelapse.frame(1) == b"frame1"
+
+
+async def test_recorder_appends_snapshots(tmp_path: Path, monkeypatch):
+    snapshots = iter([b"snapshot0", httpx.ConnectError("offline"), b"snapshot1"])
+
+    async def snapshot(url: str) -> bytes:
+        result = next(snapshots)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(camera_hub, "snapshot", snapshot)
+    recorder = TimelapseRecorder(1, "http://camera.local", interval_secs=1)
+    recorder.timelapse = Timelapse(1, path=tmp_path)
+
+    for _ in range(3):
+        await recorder.step()
+
+    assert [frame async for frame in recorder.timelapse.frames()] == [
+        b"snapshot0",
+        b"snapshot1",
+    ]
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+
+from typing_extensions import override
+
+from setting import app_settings
+from task import PeriodicTask, PollScheduler, SingleFlight
+
+
+class SleepyTask(PeriodicTask):
+    def __init__(self, interval_secs: float, step_secs: float, **kwargs) -> None:
+        super().__init__(interval_secs, **kwargs)
+        self.step_secs: float = step_secs
+        self.steps: int = 0
+
+    @override
+    async def step(self) -> None:
+        self.steps += 1
+        await asyncio.sleep(self.step_secs)
+
+
+async def run_for(task: PeriodicTask, secs: float) -> None:
+    task.start()
+    await asyncio.sleep(secs)
+    task.stop()
+    # let the loop notice the stop flag
+    await asyncio.sleep(0.15)
+
+
+async def test_step_time_is_not_added_to_period():
+    task = SleepyTask(interval_secs=0.05, step_secs=0.03)
+
+    await run_for(task, 0.52)
+
+    # 11 steps if step time is subtracted, 7 if the period is interval + step time
+    assert task.steps >= 10
+    assert task.missed_ticks == 0
+
+
+async def test_missed_ticks_are_counted():
+    task = SleepyTask(interval_secs=0.02, step_secs=0.05)
+
+    await run_for(task, 0.3)
+
+    assert task.missed_ticks > 0
+    # skipped ticks are not run in a burst to catch up
+    assert task.steps <= 7
+
+
+async def test_phase_delays_first_step():
+    task = SleepyTask(interval_secs=0.05, step_secs=0, phase_secs=0.1)
+
+    await run_for(task, 0.05)
+
+    assert task.steps == 0
+
+
+async def test_tick_lateness_is_recorded():
+    task = SleepyTask(interval_secs=0.02, step_secs=0, jitter_secs=0.005)
+
+    await run_for(task, 0.2)
+
+    assert task.ticks > 0
+    assert task.max_tick_lateness >= task.tick_lateness
+    assert task.max_tick_lateness < 0.02
+
+
+def test_late_steps_are_reported(monkeypatch, caplog):
+    monkeypatch.setattr(app_settings, "task_lateness_warning", 0.5)
+    task = SleepyTask(interval_secs=1, step_secs=0)
+
+    with caplog.at_level(logging.WARNING, logger=task.name):
+        task.record_lateness(0.1)
+        assert caplog.records == []
+
+        task.record_lateness(0.8)
+        task.next_deadline(deadline=0, now=2.5)
+
+    assert [r.levelno for r in caplog.records] == [logging.WARNING] * 2
+    assert task.missed_ticks == 2
+
+
+class CountingTask(SleepyTask):
+    running: int = 0
+    max_running: int = 0
+
+    def __init__(self, interval_secs: float, step_secs: float) -> None:
+        super().__init__(interval_secs, step_secs)
+        self.closed: bool = False
+
+    @override
+    async def step(self) -> None:
+        CountingTask.running += 1
+        CountingTask.max_running = max(CountingTask.max_running, CountingTask.running)
+        try:
+            await super().step()
+        finally:
+            CountingTask.running -= 1
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.closed = True
+
+
+async def test_poll_scheduler_runs_all_tasks():
+    poller = PollScheduler(max_concurrency=3)
+    poller.start()
+
+    tasks = [CountingTask(interval_secs=0.05, step_secs=0.01) for _ in range(10)]
+    for task in tasks:
+        await poller.add(task)
+
+    await asyncio.sleep(0.28)
+    poller.stop()
+    await asyncio.sleep(0.05)
+
+    assert all(task.steps >= 4 for task in tasks)
+    assert CountingTask.max_running <= 3
+    assert all(task.closed for task in tasks)
+
+
+async def test_poll_scheduler_removes_task():
+    poller = PollScheduler(max_concurrency=3)
+    poller.start()
+
+    task = CountingTask(interval_secs=0.02, step_secs=0)
+    await poller.add(task)
+    await asyncio.sleep(0.05)
+
+    poller.remove(task)
+    await asyncio.sleep(0.01)
+    steps = task.steps
+    await asyncio.sleep(0.05)
+
+    assert task.closed
+    assert task.steps == steps
+    assert len(poller) == 0
+
+    poller.stop()
+
+
+async def test_single_flight_shares_result():
+    flight = SingleFlight[int]()
+    calls = 0
+
+    async def call() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.run(call) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert not flight.in_flight
+    assert await flight.run(call) == 2
+
+
+async def test_single_flight_survives_cancelled_caller():
+    flight = SingleFlight[int]()
+
+    async def call() -> int:
+        await asyncio.sleep(0.01)
+        return 1
+
+    cancelled = asyncio.create_task(flight.run(call))
+    waiting = asyncio.create_task(flight.run(call))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await waiting == 1
+
+
+async def test_close_waits_for_running_step():
+    task = SleepyTask(interval_secs=60, step_secs=0.05)
+    task.start()
+    await asyncio.sleep(0.01)
+
+    await task.close()
+    assert task.steps == 1
+
+    # a task waiting for its next step is closed immediately
+    task = SleepyTask(interval_secs=60, step_secs=0)
+    task.start()
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(task.close(), 0.1)
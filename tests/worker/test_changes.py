@@ -0,0 +1,82 @@
+from printer.models import PrinterState, Temperature
+from worker import LatestPrinterStatus, StatusChangeLog
+
+
+def test_unchanged_status_is_not_recorded(printer_state: LatestPrinterStatus):
+    log = StatusChangeLog()
+
+    assert log.record(1, printer_state) == 1
+    assert log.record(1, printer_state.model_copy()) == 1
+
+
+def test_changes_since_merges_changed_fields(printer_state: LatestPrinterStatus):
+    log = StatusChangeLog()
+    log.record(1, printer_state)
+    log.record(2, printer_state)
+    seq = log.seq
+
+    # workers record a new status object for each poll
+    printing = printer_state.model_copy(update={"state": PrinterState.Printing})
+    log.record(1, printing)
+    heated = printing.model_copy(update={"temp_bed": Temperature(actual=40, target=60)})
+    log.record(1, heated)
+    log.record(2, None)
+
+    changes = log.changes_since(seq)
+
+    assert not changes.full
+    assert changes.seq == seq + 3
+    assert changes.printers == {
+        1: {
+            "state": PrinterState.Printing.value,
+            "temp_bed": {"actual": 40, "target": 60},
+        },
+        2: None,
+    }
+    assert log.changes_since(changes.seq).printers == {}
+
+
+def test_full_resync_if_cursor_is_out_of_log(printer_state: LatestPrinterStatus):
+    log = StatusChangeLog(max_size=2)
+    log.record(1, printer_state)
+    log.record(2, None)
+    printing = printer_state.model_copy(update={"state": PrinterState.Printing})
+    log.record(1, printing)
+
+    changes = log.changes_since(0)
+    assert changes.full
+    assert changes.printers == {1: printing.model_dump(mode="json"), 2: None}
+
+    # cursor from a previous run of the server
+    assert log.changes_since(100).full
+
+
+def test_removed_printers(printer_state: LatestPrinterStatus):
+    log = StatusChangeLog()
+    log.record(1, printer_state)
+    log.record(2, None)
+    seq = log.seq
+
+    assert log.forget(2) == seq + 1
+    changes = log.changes_since(seq)
+    assert changes.printers == {} and changes.removed == [2]
+    assert log.changes_since(0).printers.keys() == {1}
+
+    # the printer is added again with all fields
+    log.record(2, printer_state)
+    changes = log.changes_since(seq)
+    assert changes.removed == []
+    assert changes.printers == {2: printer_state.model_dump(mode="json")}
+
+
+def test_equal_status_is_not_encoded(printer_state: LatestPrinterStatus, monkeypatch):
+    log = StatusChangeLog()
+    log.record(1, printer_state)
+
+    def no_dump(*args, **kwargs):
+        raise AssertionError("unchanged status should not be encoded")
+
+    status = printer_state.model_copy()
+    monkeypatch.setattr(type(status), "model_dump", no_dump)
+
+    assert log.record(1, status) == 1
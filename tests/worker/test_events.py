@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from db.models import Printer
+from printer.models import PrinterStatus
+from worker import PrinterWorker, LatestPrinterStatus, StatusBroadcaster
+from worker.events import StatusEvent, StatusSubscriber, status_events
+
+
+@pytest.fixture
+def broadcaster() -> StatusBroadcaster:
+    return StatusBroadcaster()
+
+
+def test_full_subscriber_drops_oldest_event(printer_state: LatestPrinterStatus):
+    subscriber = StatusSubscriber(max_size=2)
+
+    for printer_id in range(3):
+        subscriber.put(StatusEvent(printer_id, printer_state, "{}"))
+
+    assert subscriber.qsize() == 2
+    assert subscriber.dropped == 1
+
+
+async def test_publish_to_matching_subscribers(
+    broadcaster: StatusBroadcaster,
+    mock_printer: Printer,
+    printer_state: LatestPrinterStatus,
+):
+    same_printer = broadcaster.subscribe(printer_id=mock_printer.id)
+    other_printer = broadcaster.subscribe(printer_id=100)
+    same_group = broadcaster.subscribe(group_name=mock_printer.group_name)
+    everything = broadcaster.subscribe()
+
+    broadcaster.publish(mock_printer, printer_state)
+
+    assert same_printer.qsize() == same_group.qsize() == everything.qsize() == 1
+    assert other_printer.qsize() == 0
+    event = await same_printer.get()
+    assert event.status is printer_state
+    # all subscribers share one encoded status
+    assert (await everything.get()).status_json is event.status_json
+    assert json.loads(event.status_json) == printer_state.model_dump(mode="json")
+
+
+async def test_stream_status_events(
+    broadcaster: StatusBroadcaster,
+    mock_printer: Printer,
+    printer_state: LatestPrinterStatus,
+):
+    stream = broadcaster.stream(printer_id=mock_printer.id, keepalive_secs=0.01)
+
+    assert await anext(stream) == ": keepalive\n\n"
+    assert len(broadcaster) == 1
+
+    broadcaster.publish(mock_printer, None)
+    message = await anext(stream)
+    event, data = message.removesuffix("\n\n").split("\n")
+    assert event == "event: status"
+    assert json.loads(data.removeprefix("data: ")) == {
+        "printer_id": mock_printer.id,
+        "status": None,
+    }
+
+    await stream.aclose()
+    assert len(broadcaster) == 0
+
+
+async def test_worker_publishes_polled_status(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus, monkeypatch
+):
+    async def current_status() -> PrinterStatus:
+        return PrinterStatus.model_validate(printer_state.model_dump())
+
+    monkeypatch.setattr(printer_worker.api, "current_status", current_status)
+    subscriber = status_events.subscribe(printer_id=printer_worker.printer.id)
+
+    try:
+        stat = await printer_worker.printer_status(max_age=0)
+        event = await subscriber.get()
+        assert event.status is stat
+        assert event.status_json == printer_worker.cached_status_json.decode()
+
+        # cached statuses are not published again
+        await printer_worker.printer_status(max_age=60)
+        assert subscriber.qsize() == 0
+    finally:
+        status_events.unsubscribe(subscriber)
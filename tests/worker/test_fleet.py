@@ -0,0 +1,121 @@
+import asyncio
+
+from sqlalchemy.exc import OperationalError
+
+from db.models import Printer
+from printer import MockPrinter, PrinterApi
+from printer.models import PrinterState
+from service import JobService
+from worker import PrinterWorker
+from worker.fleet import FleetReconciler
+
+
+async def printing_mock_printer(printer: Printer, file: str) -> MockPrinter:
+    api = MockPrinter(url=printer.url, job_time=100)
+    await api.connect()
+    await api.upload_file(file)
+    await api.start_job(file)
+    api.state = PrinterState.Printing
+    return api
+
+
+async def test_reconcile_fleet(job_service: JobService, monkeypatch):
+    reconciler = FleetReconciler(job_service=job_service)
+
+    for i in (1, 2):
+        printer = Printer(id=i, url=f"http://mock.printer{i}", api=PrinterApi.Mock)
+        api = await printing_mock_printer(printer, f"{i}.gcode")
+        reconciler.add(PrinterWorker(printer=printer, api=api, job_service=job_service))
+
+    commits = 0
+    commit = job_service.db.commit
+
+    async def count_commit() -> None:
+        nonlocal commits
+        commits += 1
+        await commit()
+
+    monkeypatch.setattr(job_service.db, "commit", count_commit)
+
+    await reconciler.step()
+
+    assert commits == 1
+    jobs = await job_service.current_printer_jobs([1, 2])
+    assert jobs[1].printer_filename == "1.gcode"
+    assert jobs[2].printer_filename == "2.gcode"
+
+    await reconciler.step()
+
+    # printers are still printing the same jobs, one commit per tick
+    assert commits == 2
+    assert (await job_service.current_printer_jobs([1, 2])).keys() == {1, 2}
+
+
+async def test_failed_printer_does_not_stop_fleet(job_service: JobService):
+    reconciler = FleetReconciler(job_service=job_service)
+
+    for i in (1, 2):
+        printer = Printer(id=i, url=f"http://mock.printer{i}", api=PrinterApi.Mock)
+        api = await printing_mock_printer(printer, f"{i}.gcode")
+        reconciler.add(PrinterWorker(printer=printer, api=api, job_service=job_service))
+
+    async def invalid_status():
+        raise ValueError("invalid printer response")
+
+    reconciler.workers[1].api.current_status = invalid_status
+
+    await reconciler.step()
+
+    jobs = await job_service.current_printer_jobs([1, 2])
+    assert jobs.keys() == {2}
+
+
+async def test_printers_are_reconciled_concurrently(
+    job_service: JobService, monkeypatch
+):
+    reconciler = FleetReconciler(job_service=job_service)
+
+    for i in (1, 2):
+        printer = Printer(id=i, url=f"http://mock.printer{i}", api=PrinterApi.Mock)
+        api = await printing_mock_printer(printer, f"{i}.gcode")
+        reconciler.add(PrinterWorker(printer=printer, api=api, job_service=job_service))
+
+    running = 0
+    max_running = 0
+    handle_status = PrinterWorker.handle_status
+
+    async def slow_handle_status(self, job, stat) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # e.g. uploading a gcode file
+        await asyncio.sleep(0.05)
+        await handle_status(self, job, stat)
+        running -= 1
+
+    monkeypatch.setattr(PrinterWorker, "handle_status", slow_handle_status)
+
+    await reconciler.step()
+
+    assert max_running == 2
+    assert (await job_service.current_printer_jobs([1, 2])).keys() == {1, 2}
+
+
+async def test_database_failure_is_retried_in_next_tick(
+    job_service: JobService, monkeypatch
+):
+    reconciler = FleetReconciler(job_service=job_service)
+    printer = Printer(id=1, url="http://mock.printer1", api=PrinterApi.Mock)
+    api = await printing_mock_printer(printer, "1.gcode")
+    reconciler.add(PrinterWorker(printer=printer, api=api, job_service=job_service))
+
+    async def unavailable(printer_ids):
+        raise OperationalError("SELECT", {}, ConnectionError("database is down"))
+
+    current_printer_jobs = job_service.current_printer_jobs
+    monkeypatch.setattr(job_service, "current_printer_jobs", unavailable)
+    await reconciler.step()
+
+    monkeypatch.setattr(job_service, "current_printer_jobs", current_printer_jobs)
+    await reconciler.step()
+    assert (await job_service.current_printer_jobs([1])).keys() == {1}
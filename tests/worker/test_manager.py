@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from db.models import Printer
+from printer import PrinterApi
+from tests.worker.dummy_printer import DummyPrinter
+from worker import PrinterWorker, LatestPrinterStatus, manager, status_changes
+
+
+@pytest.fixture
+def lab_printer() -> Printer:
+    return Printer(
+        id=2,
+        url="http://mock.printer2:5000",
+        api_key="key2",
+        api=PrinterApi.Mock,
+        group_name="lab",
+        opcua_name="Printer2",
+        model="Mock Printer",
+    )
+
+
+@pytest.fixture
+def workers(
+    mock_printer: Printer, lab_printer: Printer, printer_state: LatestPrinterStatus
+):
+    printing = PrinterWorker(printer=mock_printer, api=DummyPrinter(mock_printer.url))
+    printing._status_cache = printer_state
+    offline = PrinterWorker(printer=lab_printer, api=DummyPrinter(lab_printer.url))
+
+    manager.printer_workers.update({mock_printer.id: printing, lab_printer.id: offline})
+    yield
+    manager.printer_workers.clear()
+
+
+async def test_printer_statuses_are_read_from_cache(
+    workers, mock_printer: Printer, printer_state: LatestPrinterStatus, monkeypatch
+) -> None:
+    async def no_call(*args, **kwargs):
+        raise AssertionError("printer should not be called")
+
+    monkeypatch.setattr(DummyPrinter, "current_status", no_call)
+
+    assert manager.get_printer_statuses() == {mock_printer.id: printer_state, 2: None}
+    assert manager.get_printer_statuses(group_name="lab") == {2: None}
+    assert manager.get_printer_statuses(group_name="other") == {}
+
+
+async def test_printer_statuses_json(
+    workers, mock_printer: Printer, printer_state: LatestPrinterStatus
+) -> None:
+    statuses = json.loads(manager.get_printer_statuses_json())
+
+    assert statuses == {
+        str(mock_printer.id): printer_state.model_dump(mode="json"),
+        "2": None,
+    }
+    assert json.loads(manager.get_printer_statuses_json(group_name="other")) == {}
+
+    # the status is encoded once
+    worker = manager.get_printer_worker(mock_printer.id)
+    assert worker.cached_status_json is worker.cached_status_json
+
+
+async def test_stopping_worker_changes_statuses(workers, lab_printer: Printer):
+    seq = status_changes.seq
+
+    manager.stop_printer_worker(lab_printer.id)
+
+    assert status_changes.seq > seq
+    assert status_changes.changes_since(seq).removed == [lab_printer.id]
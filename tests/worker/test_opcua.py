@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from printer.models import Temperature
+from service import opcua_service
+from worker import PrinterWorker, LatestPrinterStatus
+
+
+@pytest.fixture
+def commits(printer_worker: PrinterWorker, monkeypatch) -> list[dict]:
+    printer_worker.opcua_printer = SimpleNamespace(
+        bed=SimpleNamespace(), nozzle=SimpleNamespace(), job=SimpleNamespace()
+    )
+    written: list[dict] = []
+
+    def update(obj, values: dict) -> None:
+        written.append(values)
+
+    async def commit() -> None:
+        return
+
+    monkeypatch.setattr(opcua_service, "update", update)
+    monkeypatch.setattr(opcua_service, "commit", commit)
+    return written
+
+
+async def test_only_changed_fields_are_written(
+    printer_worker: PrinterWorker,
+    printer_state: LatestPrinterStatus,
+    commits: list[dict],
+):
+    await printer_worker._update_opcua(printer_state)
+    assert "bed.actual" in commits[0] and "model" in commits[0]
+
+    printer_state.temp_bed = Temperature(actual=30, target=0)
+    await printer_worker._update_opcua(printer_state)
+
+    assert len(commits) == 2
+    assert commits[1].keys() == {"bed.actual", "update_time"}
+    assert commits[1]["bed.actual"] == 30
+
+
+async def test_unchanged_status_is_written_every_heartbeat(
+    printer_worker: PrinterWorker,
+    printer_state: LatestPrinterStatus,
+    commits: list[dict],
+):
+    await printer_worker._update_opcua(printer_state)
+    await printer_worker._update_opcua(printer_state)
+    assert len(commits) == 1
+
+    printer_worker._opcua_update_time = datetime.now() - timedelta(days=1)
+    await printer_worker._update_opcua(printer_state)
+
+    assert len(commits) == 2
+    assert commits[1].keys() == {"update_time"}
+
+
+async def test_full_state_is_written_after_reconnecting(
+    printer_worker: PrinterWorker,
+    printer_state: LatestPrinterStatus,
+    commits: list[dict],
+    monkeypatch,
+):
+    await printer_worker._update_opcua(printer_state)
+
+    # the server restarted, unchanged fields are written again
+    monkeypatch.setattr(opcua_service, "generation", opcua_service.generation + 1)
+    await printer_worker._update_opcua(printer_state)
+
+    assert len(commits) == 2
+    assert commits[1].keys() == commits[0].keys()
+
+
+async def test_values_of_failed_commit_are_written_again(
+    printer_worker: PrinterWorker,
+    printer_state: LatestPrinterStatus,
+    commits: list[dict],
+    monkeypatch,
+):
+    async def failed_commit() -> None:
+        monkeypatch.setattr(opcua_service, "generation", opcua_service.generation + 1)
+
+    monkeypatch.setattr(opcua_service, "commit", failed_commit)
+    await printer_worker._update_opcua(printer_state)
+    await printer_worker._update_opcua(printer_state)
+
+    assert len(commits) == 2
+    assert commits[1].keys() == commits[0].keys()
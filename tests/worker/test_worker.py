@@ -1,7 +1,9 @@
+import asyncio
 from datetime import datetime, timedelta
 
 from db.models import Printer, Job, JobStatus
-from printer.models import PrinterState, LatestJob
+from printer.models import PrinterState, LatestJob, PrinterStatus
+from setting import app_settings
 from tests.worker.dummy_printer import DummyPrinter
 from worker import PrinterWorker, LatestPrinterStatus
 
@@ -250,3 +252,113 @@ async def test_different_job_with_same_file(
 
     assert job.is_picked()
     assert dummy_printer.is_printing_file("A.gcode")
+
+
+async def test_poll_interval_of_unreachable_printer(printer_worker: PrinterWorker):
+    assert printer_worker.next_interval() == (
+        app_settings.printer_worker_offline_interval
+    )
+
+
+async def test_poll_interval_of_idle_printer(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus
+):
+    printer_worker._status_cache = printer_state
+    assert printer_worker.next_interval() == app_settings.printer_worker_idle_interval
+
+
+async def test_poll_interval_of_printing_printer(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus
+):
+    printer_state.state = PrinterState.Printing
+    printer_state.job = LatestJob(
+        file_path="A.gcode", progress=50, time_used=100, time_left=100
+    )
+    printer_worker._status_cache = printer_state
+
+    assert printer_worker.next_interval() == printer_worker.interval_secs
+
+    printer_state.job.progress = app_settings.printer_worker_finishing_progress
+    assert printer_worker.next_interval() == (
+        app_settings.printer_worker_finishing_interval
+    )
+
+
+async def test_concurrent_stale_status_requests_share_one_printer_call(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus, monkeypatch
+):
+    calls = 0
+
+    async def current_status() -> PrinterStatus:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return PrinterStatus.model_validate(printer_state.model_dump())
+
+    monkeypatch.setattr(printer_worker.api, "current_status", current_status)
+
+    results = await asyncio.gather(
+        *(printer_worker.printer_status() for _ in range(100))
+    )
+
+    assert calls == 1
+    assert all(stat is results[0] for stat in results)
+    assert results[0].state == printer_state.state
+
+
+def test_latest_status_matches_validated_status(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus
+):
+    printer_state.job = LatestJob(
+        file_path="XYZ.gcode", progress=50, time_used=100, time_left=100
+    )
+    stat = PrinterStatus.model_validate(printer_state.model_dump())
+
+    latest = printer_worker.latest_status(stat)
+
+    assert latest.model_dump() == printer_state.model_dump()
+    assert latest.model_dump_json() == printer_state.model_dump_json()
+
+
+async def test_timelapse_is_recorded_while_printing(
+    printer_worker: PrinterWorker,
+    printer_state: LatestPrinterStatus,
+    mock_printer: Printer,
+    monkeypatch,
+):
+    monkeypatch.setattr(app_settings, "timelapse_enabled", True)
+    monkeypatch.setattr(mock_printer, "camera_url", "http://camera.local")
+    monkeypatch.setattr("task.PeriodicTask.start", lambda self: None)
+
+    job = Job(
+        id=1,
+        printer_id=mock_printer.id,
+        status=(JobStatus.Printing | JobStatus.Scheduled).value,
+    )
+    printer_state.state = PrinterState.Printing
+
+    printer_worker.update_timelapse(job, printer_state)
+    recorder = printer_worker.timelapse
+    assert recorder is not None and recorder.job_id == job.id
+
+    printer_worker.update_timelapse(job, printer_state)
+    assert printer_worker.timelapse is recorder
+
+    job.status |= JobStatus.Printed.value
+    printer_worker.update_timelapse(job, printer_state)
+    assert printer_worker.timelapse is None
+
+
+async def test_idle_status_is_cached_until_next_poll(
+    printer_worker: PrinterWorker, printer_state: LatestPrinterStatus, monkeypatch
+):
+    async def no_call():
+        raise AssertionError("printer should not be called")
+
+    printer_worker._status_cache = printer_state
+    # older than the printing interval but younger than the idle interval
+    age = (app_settings.printer_worker_interval + 1) * 1000
+    printer_worker._cache_update_time = datetime.now() - timedelta(milliseconds=age)
+    monkeypatch.setattr(printer_worker.api, "current_status", no_call)
+
+    assert await printer_worker.printer_status() is printer_state